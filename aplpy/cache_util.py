@@ -0,0 +1,111 @@
+import os
+import threading
+from collections import OrderedDict
+
+__all__ = ['LRUCache', 'get_parsed', 'set_parsed', 'clear']
+
+
+class LRUCache(object):
+    """
+    A simple thread-safe least recently used cache.
+
+    Parameters
+    ----------
+    maxsize : int
+        The maximum number of entries, or the maximum total size of the
+        values if ``sizeof`` is given. If this is zero, nothing is cached.
+        Values larger than this are not cached, without evicting any other
+        values.
+    on_evict : callable, optional
+        A function called with each value removed from the cache.
+    sizeof : callable, optional
+        A function returning the size of a value, e.g. in bytes.
+    """
+
+    def __init__(self, maxsize, on_evict=None, sizeof=None):
+        self.maxsize = maxsize
+        self._on_evict = on_evict
+        self._sizeof = sizeof
+        self._size = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+            else:
+                return default
+
+    def set(self, key, value):
+        with self._lock:
+            if key in self._data:
+                self._size -= self._value_size(self._data.pop(key))
+            size = self._value_size(value)
+            if size > self.maxsize or self.maxsize <= 0:
+                return
+            self._data[key] = value
+            self._size += size
+            while self._data and self._size > self.maxsize:
+                self._evict(self._data.popitem(last=False)[1])
+
+    def clear(self):
+        with self._lock:
+            while self._data:
+                self._evict(self._data.popitem(last=False)[1])
+
+    def _value_size(self, value):
+        return 1 if self._sizeof is None else self._sizeof(value)
+
+    def _evict(self, value):
+        self._size -= self._value_size(value)
+        if self._on_evict is not None:
+            self._on_evict(value)
+
+
+# Per-process cache of the headers and WCS objects parsed from FITS files.
+# Entries are keyed by the path, modification time and size of the files, so
+# that modified files are parsed again. Only parsed information is cached,
+# so that files can be closed as soon as the data has been read in.
+PARSED = LRUCache(128)
+
+
+def file_key(filename):
+    """
+    Return a key identifying the current version of a file.
+    """
+    stat = os.stat(filename)
+    return os.path.realpath(filename), stat.st_mtime_ns, stat.st_size
+
+
+def get_parsed(key):
+    """
+    Return copies of the cached header and WCS, as well as any extra
+    information, for a given key, or `None` if the key is not in the cache.
+    """
+    value = PARSED.get(key)
+    if value is None:
+        return None
+    header, wcs, extra = value
+    return header.copy(), wcs.deepcopy(), extra
+
+
+def set_parsed(key, header, wcs, extra=None):
+    """
+    Cache copies of a header and WCS, as well as any extra information.
+    """
+    PARSED.set(key, (header.copy(), wcs.deepcopy(), extra))
+
+
+def clear():
+    """
+    Empty the cache.
+    """
+    PARSED.clear()
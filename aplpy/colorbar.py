@@ -4,7 +4,9 @@ import matplotlib.axes as maxes
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 from matplotlib.font_manager import FontProperties
 from matplotlib.ticker import LogFormatterMathtext
+from matplotlib.cm import ScalarMappable
 
+from .lut_util import LUTNormalize
 from .decorators import auto_refresh, fixdocstring
 
 
@@ -117,7 +119,14 @@ class Colorbar(object):
             else:
                 format = None
 
-            self._colorbar = self._figure.colorbar(self._parent.image, cax=self._colorbar_axes,
+            # Images shown using a lookup table contain indices rather than
+            # data values, so we show the normalization of the data instead
+            mappable = self._parent.image
+            if isinstance(mappable.norm, LUTNormalize):
+                mappable = ScalarMappable(norm=mappable.norm.data_norm,
+                                          cmap=mappable.get_cmap())
+
+            self._colorbar = self._figure.colorbar(mappable, cax=self._colorbar_axes,
                                                    orientation=orientation, format=format,
                                                    ticks=ticks)
             if axis_label_text:
@@ -0,0 +1,245 @@
+import numpy as np
+from matplotlib.contour import ContourSet
+from matplotlib.path import Path
+
+from . import contour_util
+
+__all__ = ['ContourLayer']
+
+# Relative change in the scale of the axes after which simplified contours
+# are computed again
+RESCALE_THRESHOLD = 0.1
+
+
+def _data_per_pixel(ax):
+    # Return the size of an output pixel in data units, for the current view
+    # limits, figure size and dpi
+    origin, x, y = ax.transData.transform([[0, 0], [1, 0], [0, 1]])
+    (a, b), (c, d) = x - origin, y - origin
+    return 1. / np.sqrt(abs(a * d - b * c))
+
+
+class _LayerContourSet(ContourSet):
+    # A contour set which lets the layer simplify the contours for the
+    # current scale before it is drawn
+
+    def __init__(self, layer, *args, **kwargs):
+        self._layer = layer
+        super().__init__(*args, **kwargs)
+
+    def draw(self, renderer):
+        self._layer._rescale()
+        super().draw(renderer)
+
+
+class ContourLayer(object):
+    """
+    A contour layer which keeps the contours computed for each level.
+
+    Changing the levels with :meth:`set_levels`, :meth:`add_levels` or
+    :meth:`remove_levels` only computes the contours for levels (or pairs
+    of levels for filled contours) that have not been computed before, and
+    changing the style of the contours with :meth:`set` or the visibility
+    with :meth:`set_visible` never recomputes the contours.
+
+    If the contours are simplified, the full contours are kept, and the
+    simplified contours are computed again when drawing if the size of the
+    output pixels has changed (e.g. after zooming, or when saving the figure
+    with a different dpi).
+
+    The contours are drawn by a :class:`~matplotlib.contour.ContourSet`,
+    available as the ``contour_set`` attribute, and attributes not defined
+    here (e.g. ``clabel``) are looked up on the ``contour_set``.
+
+    Parameters
+    ----------
+    ax : `~astropy.visualization.wcsaxes.WCSAxes`
+        The axes in which to show the contours.
+    image : `~numpy.ndarray`
+        The array to contour. A reference to this array is kept to compute
+        contours for new levels.
+    levels : iterable
+        The initial contour levels.
+    transform : `~matplotlib.transforms.Transform`
+        The transformation from the pixel coordinates of the array to the
+        data coordinates of the axes.
+    offset : tuple, optional
+        The pixel coordinates of the first column and row of the array, if
+        it is a cutout of a larger image.
+    footprint : `shapely.geometry.Polygon`, optional
+        If specified, contours that do not intersect this footprint (in the
+        pixel coordinates of the array) are dropped.
+    filled : bool, optional
+        Whether to show filled contours.
+    simplify : float, optional
+        If specified, contours are simplified so that they deviate by at most
+        this many output pixels from the original contours.
+    min_area : float, optional
+        If specified, closed contours with an area smaller than this (in
+        square output pixels) are not shown.
+    kwargs
+        Additional keyword arguments are passed to
+        :class:`~matplotlib.contour.ContourSet`.
+    """
+
+    def __init__(self, ax, image, levels, transform, offset=(0, 0),
+                 footprint=None, filled=False, simplify=None, min_area=None,
+                 **kwargs):
+        self._ax = ax
+        self._image = image
+        self._transform = transform
+        self._offset = offset
+        self._footprint = footprint
+        self.filled = filled
+        self._kwargs = kwargs
+        self._visible = True
+        self._simplify = simplify
+        self._min_area = min_area
+        self._scale = None
+        self._paths = {}
+        self.contour_set = None
+        self.set_levels(levels)
+
+    def __getattr__(self, attribute):
+        if attribute.startswith('_') or self.__dict__.get('contour_set') is None:
+            raise AttributeError(attribute)
+        return getattr(self.contour_set, attribute)
+
+    @property
+    def levels(self):
+        """
+        The current contour levels.
+        """
+        return self._levels.copy()
+
+    def set_levels(self, levels):
+        """
+        Set the contour levels, computing contours only for new levels.
+        """
+        self._levels = np.unique(np.asarray(levels, dtype=float))
+        self._compute(self._keys())
+        self._update()
+
+    def add_levels(self, levels):
+        """
+        Add contour levels.
+        """
+        self.set_levels(np.hstack([self._levels, np.atleast_1d(levels)]))
+
+    def remove_levels(self, levels):
+        """
+        Remove contour levels.
+        """
+        self.set_levels(np.setdiff1d(self._levels, levels))
+
+    def set(self, **kwargs):
+        """
+        Change the style of the contours. The keyword arguments are the same
+        as for :class:`~matplotlib.contour.ContourSet` (e.g. colors, cmap,
+        linewidths, linestyles, or alpha).
+        """
+        # Only one of colors and cmap can be set
+        if kwargs.get('colors') is not None:
+            self._kwargs['cmap'] = None
+        elif kwargs.get('cmap') is not None:
+            self._kwargs['colors'] = None
+        self._kwargs.update(kwargs)
+        self._update()
+
+    def get_visible(self):
+        return self._visible
+
+    def set_visible(self, visible=True):
+        self._visible = visible
+        if self.contour_set is not None:
+            self.contour_set.set_visible(visible)
+
+    def set_zorder(self, zorder):
+        self.set(zorder=zorder)
+
+    def remove(self):
+        if self.contour_set is not None:
+            self.contour_set.remove()
+            self.contour_set = None
+
+    def _keys(self):
+        # The contours are computed for each level, or for each pair of
+        # consecutive levels for filled contours
+        if self.filled:
+            return list(zip(self._levels[:-1], self._levels[1:]))
+        else:
+            return list(self._levels)
+
+    def _compute(self, keys):
+
+        keys = [key for key in keys if key not in self._paths]
+
+        if len(keys) == 0:
+            return
+
+        if self.filled:
+            # As in Matplotlib, include the minimum value in the first band
+            zmin = np.nanmin(self._image)
+            bands = [(lower - 1 if lower == zmin else lower, upper)
+                     for lower, upper in keys]
+            allsegs, allkinds = contour_util.contour_bands(self._image, bands)
+        else:
+            allsegs, allkinds = contour_util.contour_lines(self._image, keys)
+
+        paths = []
+        for segs, kinds in zip(allsegs, allkinds):
+            if len(segs) == 0:
+                paths.append(Path(np.empty((0, 2)), np.empty(0, dtype=Path.code_type)))
+            else:
+                paths.append(Path(np.vstack(segs) + self._offset, np.hstack(kinds)))
+
+        if self._footprint is not None:
+            paths = contour_util.drop_paths(paths, self._footprint,
+                                            filled=self.filled)
+
+        # Transform the contours for all the new levels in one go, since
+        # the overhead of WCS transformations is significant
+        if any(len(path.vertices) > 0 for path in paths):
+            vertices = self._transform.transform(np.vstack([path.vertices for path in paths]))
+            vertices = np.split(vertices, np.cumsum([len(path.vertices) for path in paths])[:-1])
+            paths = [Path(v, path.codes) for v, path in zip(vertices, paths)]
+
+        self._paths.update(zip(keys, paths))
+
+    def _simplified_paths(self):
+        # Return the simplified contours for the current levels and scale
+        self._scale = _data_per_pixel(self._ax)
+        paths = [self._paths[key] for key in self._keys()]
+        return contour_util.simplify_paths(paths,
+                                           tolerance=(self._simplify or 0.) * self._scale,
+                                           min_area=(self._min_area or 0.) * self._scale ** 2,
+                                           filled=self.filled)
+
+    def _rescale(self):
+        # Simplify the contours again if the size of output pixels changed
+        if self._scale is None:
+            return
+        if abs(_data_per_pixel(self._ax) / self._scale - 1) > RESCALE_THRESHOLD:
+            self.contour_set.set_paths(self._simplified_paths())
+
+    def _update(self):
+
+        # Re-create the contour set from the stored contours
+        self.remove()
+
+        paths = [self._paths[key] for key in self._keys()]
+
+        # ContourSet cannot be initialized without any contours
+        if not any(len(path.vertices) > 0 for path in paths):
+            return
+
+        allsegs = [[path.vertices] if len(path.vertices) > 0 else [] for path in paths]
+        allkinds = [[path.codes] if len(path.vertices) > 0 else [] for path in paths]
+
+        self.contour_set = _LayerContourSet(self, self._ax, self._levels,
+                                            allsegs, allkinds,
+                                            filled=self.filled, **self._kwargs)
+        self.contour_set.set_visible(self._visible)
+
+        if self._simplify is not None or self._min_area is not None:
+            self.contour_set.set_paths(self._simplified_paths())
@@ -0,0 +1,506 @@
+import os
+import warnings
+
+import numpy as np
+from matplotlib.path import Path
+
+import contourpy
+from contourpy import FillType, LineType
+
+import shapely
+from shapely.geometry import Polygon
+
+from reproject import reproject_interp
+
+# Number of points sampled along each edge of an image to find its footprint
+N_SAMPLES = 50
+
+# Size of the tiles in which contour lines are computed in parallel
+TILE_SIZE = 512
+
+
+def _celestial_wcs(wcs, dimensions):
+    # Return the celestial part of a WCS if the image dimensions are the
+    # celestial axes (in order), and None otherwise.
+    if not wcs.has_celestial or list(dimensions) != sorted(dimensions):
+        return None
+    if {wcs.wcs.lng, wcs.wcs.lat} != set(dimensions):
+        return None
+    return wcs.celestial
+
+
+def image_footprint(wcs, shape, wcs_target, dimensions=[0, 1],
+                    dimensions_target=[0, 1], n_samples=N_SAMPLES):
+    """
+    Return the footprint of an image in the pixel coordinates of another
+    image, as a shapely polygon.
+
+    Parameters
+    ----------
+    wcs : `~astropy.wcs.WCS`
+        The WCS of the image.
+    shape : tuple
+        The (ny, nx) shape of the image.
+    wcs_target : `~astropy.wcs.WCS`
+        The WCS of the image in whose pixel coordinates the footprint is
+        returned.
+    dimensions, dimensions_target : tuple or list, optional
+        The index of the axes used for the two images.
+    n_samples : int, optional
+        The number of points sampled along each edge of the image.
+
+    Returns
+    -------
+    footprint : `shapely.geometry.Polygon` or `None`
+        The footprint, or `None` if it cannot be determined, for example
+        if the images do not have celestial coordinates or if part of the
+        edges of the image cannot be projected.
+    """
+
+    wcs = _celestial_wcs(wcs, dimensions)
+    wcs_target = _celestial_wcs(wcs_target, dimensions_target)
+
+    if wcs is None or wcs_target is None:
+        return None
+
+    ny, nx = shape
+    t = np.linspace(0., 1., n_samples, endpoint=False)
+    xmin, xmax, ymin, ymax = -0.5, nx - 0.5, -0.5, ny - 0.5
+    xp = np.hstack([xmin + t * (xmax - xmin), np.repeat(xmax, n_samples),
+                    xmax - t * (xmax - xmin), np.repeat(xmin, n_samples)])
+    yp = np.hstack([np.repeat(ymin, n_samples), ymin + t * (ymax - ymin),
+                    np.repeat(ymax, n_samples), ymax - t * (ymax - ymin)])
+
+    with warnings.catch_warnings():
+        # Warnings about points that cannot be converted, which we check for
+        warnings.simplefilter('ignore')
+        coords = wcs.pixel_to_world(xp, yp)
+        xt, yt = wcs_target.world_to_pixel(coords)
+
+    if not (np.all(np.isfinite(xt)) and np.all(np.isfinite(yt))):
+        return None
+
+    footprint = Polygon(np.column_stack([xt, yt]))
+
+    if not footprint.is_valid:
+        footprint = shapely.make_valid(footprint)
+
+    return footprint
+
+
+def reproject_to_image(data, wcs, wcs_target, shape_target, dimensions=[0, 1],
+                       dimensions_target=[0, 1], slices=None):
+    """
+    Resample an image onto the pixel grid of another image.
+
+    Parameters
+    ----------
+    data : `~numpy.ndarray`
+        The image to resample.
+    wcs : `~astropy.wcs.WCS`
+        The WCS of the image.
+    wcs_target : `~astropy.wcs.WCS`
+        The WCS of the image onto whose pixel grid the image is resampled.
+    shape_target : tuple
+        The (ny, nx) shape of the target image.
+    dimensions, dimensions_target : tuple or list, optional
+        The index of the axes used for the two images.
+    slices : tuple, optional
+        If data is a cutout of the image described by ``wcs``, the slices
+        used to extract it.
+
+    Returns
+    -------
+    array : `~numpy.ndarray` or `None`
+        The resampled image, or `None` if the images do not have celestial
+        coordinates.
+    """
+
+    wcs = _celestial_wcs(wcs, dimensions)
+    wcs_target = _celestial_wcs(wcs_target, dimensions_target)
+
+    if wcs is None or wcs_target is None:
+        return None
+
+    if slices is not None:
+        wcs = wcs[slices]
+
+    return reproject_interp((data, wcs), wcs_target, shape_out=shape_target,
+                            return_footprint=False)
+
+
+def overlap_slices(footprint, shape, margin=0):
+    """
+    Return the slices of an image of shape (ny, nx) covering a footprint in
+    the pixel coordinates of that image, extended by a margin (in pixels).
+
+    Returns `None` if the footprint does not overlap with the image.
+    """
+
+    ny, nx = shape
+    overlap = footprint.intersection(shapely.box(-0.5, -0.5, nx - 0.5, ny - 0.5))
+
+    if overlap.is_empty:
+        return None
+
+    xmin, ymin, xmax, ymax = overlap.bounds
+
+    imin = max(int(np.floor(xmin + 0.5)) - margin, 0)
+    imax = min(int(np.ceil(xmax + 0.5)) + margin, nx)
+    jmin = max(int(np.floor(ymin + 0.5)) - margin, 0)
+    jmax = min(int(np.ceil(ymax + 0.5)) + margin, ny)
+
+    return slice(jmin, jmax), slice(imin, imax)
+
+
+def _components(path):
+    # Split a path into its connected components, each starting with MOVETO
+    if path.codes is None:
+        return [(path.vertices, None)]
+    starts = np.nonzero(path.codes == Path.MOVETO)[0]
+    return list(zip(np.split(path.vertices, starts[1:]),
+                    np.split(path.codes, starts[1:])))
+
+
+def _signed_area(vertices):
+    x, y = vertices[:, 0], vertices[:, 1]
+    return 0.5 * np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+
+
+def _group(components, filled):
+    # For filled contours, group holes with the preceding outer boundary,
+    # which are oriented in the opposite direction.
+    if filled:
+        groups = []
+        outer_sign = np.sign(_signed_area(components[0][0]))
+        for component in components:
+            if not groups or np.sign(_signed_area(component[0])) == outer_sign:
+                groups.append([component])
+            else:
+                groups[-1].append(component)
+    else:
+        groups = [[component] for component in components]
+    return groups
+
+
+def _is_closed(vertices, codes):
+    if codes is not None and codes[-1] == Path.CLOSEPOLY:
+        return True
+    return len(vertices) > 2 and np.all(vertices[0] == vertices[-1])
+
+
+def drop_paths(paths, footprint, filled=False):
+    """
+    Remove the parts of contour paths that do not overlap with a footprint.
+
+    Each path is split into its connected components, and the components
+    whose bounding box does not intersect the footprint are dropped. For
+    filled contours, holes are kept or dropped together with the boundary
+    that encloses them.
+
+    Parameters
+    ----------
+    paths : list of `~matplotlib.path.Path`
+        The paths for each contour level.
+    footprint : `shapely.geometry.Polygon`
+        The footprint, in the same coordinates as the paths.
+    filled : bool, optional
+        Whether the paths are from filled contours.
+
+    Returns
+    -------
+    paths : list of `~matplotlib.path.Path`
+    """
+
+    shapely.prepare(footprint)
+
+    new_paths = []
+
+    for path in paths:
+
+        components = [c for c in _components(path) if len(c[0]) > 0]
+
+        if len(components) == 0:
+            new_paths.append(path)
+            continue
+
+        groups = _group(components, filled)
+
+        bounds = np.array([[group[0][0][:, 0].min(), group[0][0][:, 1].min(),
+                            group[0][0][:, 0].max(), group[0][0][:, 1].max()]
+                           for group in groups])
+        keep = shapely.intersects(footprint, shapely.box(*bounds.T))
+
+        kept = [component for group, k in zip(groups, keep) if k
+                for component in group]
+
+        if len(kept) == len(components):
+            new_paths.append(path)
+        elif len(kept) == 0:
+            new_paths.append(Path(np.empty((0, 2)), np.empty(0, dtype=Path.code_type)))
+        else:
+            vertices = np.vstack([component[0] for component in kept])
+            if path.codes is None:
+                codes = None
+            else:
+                codes = np.hstack([component[1] for component in kept])
+            new_paths.append(Path(vertices, codes))
+
+    return new_paths
+
+
+def simplify_paths(paths, tolerance=0., min_area=0., filled=False):
+    """
+    Simplify contour paths, and remove small closed contours.
+
+    Each connected component of the paths is simplified with the
+    Douglas-Peucker algorithm, and closed components with an area smaller
+    than ``min_area`` are dropped. For filled contours, holes are dropped
+    together with the boundary that encloses them.
+
+    Parameters
+    ----------
+    paths : list of `~matplotlib.path.Path`
+        The paths for each contour level.
+    tolerance : float, optional
+        The maximum distance between the original and simplified paths.
+    min_area : float, optional
+        The minimum area of closed contours.
+    filled : bool, optional
+        Whether the paths are from filled contours.
+
+    Returns
+    -------
+    paths : list of `~matplotlib.path.Path`
+    """
+
+    new_paths = []
+
+    for path in paths:
+
+        components = [c for c in _components(path) if len(c[0]) > 0]
+
+        if len(components) == 0:
+            new_paths.append(path)
+            continue
+
+        kept = []
+        for group in _group(components, filled):
+            for index, (vertices, codes) in enumerate(group):
+                closed = _is_closed(vertices, codes)
+                if closed and abs(_signed_area(vertices)) < min_area:
+                    if index == 0:
+                        break
+                    continue
+                kept.append((vertices, closed))
+
+        if tolerance > 0 and len(kept) > 0:
+            lengths = [len(vertices) for vertices, _ in kept]
+            lines = shapely.linestrings(np.vstack([vertices for vertices, _ in kept]),
+                                        indices=np.repeat(np.arange(len(kept)), lengths))
+            lines = shapely.simplify(lines, tolerance, preserve_topology=False)
+            coords, index = shapely.get_coordinates(lines, return_index=True)
+            simplified = np.split(coords, np.cumsum(np.bincount(index, minlength=len(kept)))[:-1])
+            # Closed contours smaller than the tolerance collapse
+            kept = [(vertices, closed) for vertices, (_, closed) in zip(simplified, kept)
+                    if len(vertices) > (3 if closed else 1)]
+
+        if len(kept) == 0:
+            new_paths.append(Path(np.empty((0, 2)), np.empty(0, dtype=Path.code_type)))
+            continue
+
+        all_codes = []
+        for vertices, closed in kept:
+            codes = np.full(len(vertices), Path.LINETO, dtype=Path.code_type)
+            codes[0] = Path.MOVETO
+            if closed:
+                codes[-1] = Path.CLOSEPOLY
+            all_codes.append(codes)
+
+        new_paths.append(Path(np.vstack([vertices for vertices, _ in kept]),
+                              np.hstack(all_codes)))
+
+    return new_paths
+
+
+def _endpoint_key(point):
+    # Pieces of lines meeting at a tile boundary share the same end point,
+    # up to rounding errors.
+    return tuple(np.round(point * 2 ** 20).astype(np.int64))
+
+
+def _stitch(pieces):
+    """
+    Join open lines whose end points coincide into continuous lines.
+
+    Returns a list of (vertices, closed) tuples.
+    """
+
+    ends = {}
+    for index, piece in enumerate(pieces):
+        for end in (0, -1):
+            ends.setdefault(_endpoint_key(piece[end]), []).append(index)
+
+    def next_piece(point, used):
+        for index in ends[_endpoint_key(point)]:
+            if not used[index]:
+                return index
+        return None
+
+    used = np.zeros(len(pieces), dtype=bool)
+    lines = []
+
+    for start in range(len(pieces)):
+
+        if used[start]:
+            continue
+
+        used[start] = True
+        chain = [pieces[start]]
+
+        # Extend the line forwards, then backwards
+        for forwards in (True, False):
+            while True:
+                point = chain[-1][-1] if forwards else chain[0][0]
+                index = next_piece(point, used)
+                if index is None:
+                    break
+                used[index] = True
+                piece = pieces[index]
+                if forwards:
+                    if _endpoint_key(piece[0]) != _endpoint_key(point):
+                        piece = piece[::-1]
+                    chain.append(piece[1:])
+                else:
+                    if _endpoint_key(piece[-1]) != _endpoint_key(point):
+                        piece = piece[::-1]
+                    chain.insert(0, piece[:-1])
+
+        vertices = np.vstack(chain)
+        closed = (len(vertices) > 2 and
+                  _endpoint_key(vertices[0]) == _endpoint_key(vertices[-1]))
+        lines.append((vertices, closed))
+
+    return lines
+
+
+def contour_lines(data, levels, max_workers=None, tile_size=TILE_SIZE):
+    """
+    Compute contour lines of a two-dimensional array.
+
+    The array is split into tiles which are contoured in parallel, and the
+    pieces of lines that cross tile boundaries are joined again, so that
+    each contour line is returned as a single continuous line. NaN values
+    are masked.
+
+    Parameters
+    ----------
+    data : `~numpy.ndarray`
+        The array to contour.
+    levels : iterable
+        The contour levels.
+    max_workers : int, optional
+        The maximum number of threads to use. Defaults to the number of CPUs.
+    tile_size : int, optional
+        The size of the tiles along each dimension.
+
+    Returns
+    -------
+    allsegs, allkinds : list
+        For each level, the list of vertices of the contour lines (in pixel
+        coordinates) and the corresponding path codes, as expected by
+        :class:`~matplotlib.contour.ContourSet`.
+    """
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    generator = contourpy.contour_generator(z=np.ma.masked_invalid(data),
+                                            name='threaded',
+                                            line_type=LineType.ChunkCombinedOffset,
+                                            corner_mask=True,
+                                            chunk_size=tile_size,
+                                            thread_count=max_workers)
+
+    multiple_tiles = generator.chunk_count != (1, 1)
+
+    allsegs, allkinds = [], []
+
+    for level in levels:
+
+        all_points, all_offsets = generator.lines(level)
+
+        closed_lines, pieces = [], []
+        for points, offsets in zip(all_points, all_offsets):
+            if points is None:
+                continue
+            for start, stop in zip(offsets[:-1], offsets[1:]):
+                line = points[start:stop]
+                if np.all(line[0] == line[-1]) or not multiple_tiles:
+                    closed_lines.append((line, np.all(line[0] == line[-1])))
+                else:
+                    pieces.append(line)
+
+        lines = closed_lines + _stitch(pieces)
+
+        segs, kinds = [], []
+        for vertices, closed in lines:
+            codes = np.full(len(vertices), Path.LINETO, dtype=Path.code_type)
+            codes[0] = Path.MOVETO
+            if closed:
+                codes[-1] = Path.CLOSEPOLY
+            segs.append(vertices)
+            kinds.append(codes)
+
+        allsegs.append(segs)
+        allkinds.append(kinds)
+
+    return allsegs, allkinds
+
+
+def contour_bands(data, bands, max_workers=None, tile_size=TILE_SIZE):
+    """
+    Compute filled contours of a two-dimensional array.
+
+    The array is split into tiles which are contoured in parallel. Unlike
+    for contour lines, the polygons are not joined across tile boundaries,
+    since this does not change how they are drawn. NaN values are masked.
+
+    Parameters
+    ----------
+    data : `~numpy.ndarray`
+        The array to contour.
+    bands : iterable
+        The (lower, upper) levels of the filled contours.
+    max_workers : int, optional
+        The maximum number of threads to use. Defaults to the number of CPUs.
+    tile_size : int, optional
+        The size of the tiles along each dimension.
+
+    Returns
+    -------
+    allsegs, allkinds : list
+        For each band, the list of vertices of the polygons (in pixel
+        coordinates, with each outer boundary followed by its holes) and the
+        corresponding path codes, as expected by
+        :class:`~matplotlib.contour.ContourSet`.
+    """
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    generator = contourpy.contour_generator(z=np.ma.masked_invalid(data),
+                                            name='threaded',
+                                            fill_type=FillType.OuterCode,
+                                            corner_mask=True,
+                                            chunk_size=tile_size,
+                                            thread_count=max_workers)
+
+    allsegs, allkinds = [], []
+
+    for lower, upper in bands:
+        segs, kinds = generator.filled(lower, upper)
+        allsegs.append(list(segs))
+        allkinds.append(list(kinds))
+
+    return allsegs, allkinds
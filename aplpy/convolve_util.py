@@ -1,10 +1,203 @@
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
-from astropy.convolution import (convolve as astropy_convolve,
+from astropy.convolution import (convolve as astropy_convolve, Kernel,
                                  Gaussian2DKernel, Box2DKernel)
 
+# Kernels with at least this many elements are convolved using FFTs if they
+# are not separable, since direct summation becomes slower at this point
+FFT_MIN_SIZE = 13 * 13
+
+# Number of bands to split the image into per worker, to balance the load
+CHUNKS_PER_WORKER = 4
+
+# Maximum total size in bytes of the smoothed images cached by each figure
+CACHE_SIZE = 256 * 1024 ** 2
+
+
+def _separate(kernel):
+    """
+    If a two-dimensional kernel is separable, return the one-dimensional
+    kernels along y and x whose outer product gives the kernel, otherwise
+    return `None`.
+    """
+    j, i = np.unravel_index(np.argmax(np.abs(kernel)), kernel.shape)
+    kernel_y = kernel[:, i]
+    kernel_x = kernel[j, :] / kernel[j, i]
+    if np.allclose(np.outer(kernel_y, kernel_x), kernel,
+                   rtol=1e-10, atol=1e-14 * abs(kernel[j, i])):
+        return kernel_y, kernel_x
+    else:
+        return None
+
+
+def _fast_length(n):
+    """
+    Return the smallest length larger than or equal to n that only has 2, 3,
+    and 5 as prime factors, for which FFTs are efficient.
+    """
+    best = 2 ** int(np.ceil(np.log2(n)))
+    power5 = 1
+    while power5 < best:
+        power3 = power5
+        while power3 < best:
+            length = power3
+            while length < n:
+                length *= 2
+            best = min(best, length)
+            power3 *= 3
+        power5 *= 5
+    return best
+
+
+def _convolve_direct(image, kernel):
+    # Plain convolution of an array without NaN values
+    return astropy_convolve(image, kernel, boundary='extend',
+                            nan_treatment='fill', fill_value=0.,
+                            normalize_kernel=False)
+
+
+def _convolve_separable(image, kernel_y, kernel_x):
+    result = _convolve_direct(image, kernel_x[np.newaxis, :])
+    return _convolve_direct(result, kernel_y[:, np.newaxis])
+
+
+def _convolve_fft(images, kernel):
+    # Plain convolution of several arrays without NaN values. The arrays are
+    # padded with their edge values to reproduce boundary='extend'.
+    ny, nx = kernel.shape
+    py, px = ny // 2, nx // 2
+    shape = images[0].shape
+    fft_shape = (_fast_length(shape[0] + 2 * py + ny - 1),
+                 _fast_length(shape[1] + 2 * px + nx - 1))
+    kernel_fft = np.fft.rfft2(kernel, s=fft_shape)
+    results = []
+    for image in images:
+        padded = np.pad(image, ((py, py), (px, px)), mode='edge')
+        result = np.fft.irfft2(np.fft.rfft2(padded, s=fft_shape) * kernel_fft,
+                               s=fft_shape)
+        results.append(result[2 * py:2 * py + shape[0], 2 * px:2 * px + shape[1]])
+    return results
+
+
+def kernel_key(smooth=3, kernel='gauss'):
+    """
+    Return a hashable key identifying the smoothing done by :func:`convolve`
+    for the given arguments.
+    """
+    if isinstance(kernel, str):
+        return smooth, kernel
+    if isinstance(kernel, Kernel):
+        kernel = kernel.array
+    kernel = np.ascontiguousarray(kernel, dtype=float)
+    return smooth, kernel.shape, hashlib.sha1(kernel.tobytes()).hexdigest()
+
+
+def _make_kernel(smooth, kernel):
+    # Return the kernel to pass to astropy and the kernel as an array
+    if isinstance(kernel, str):
+        if kernel == 'gauss':
+            kernel = Gaussian2DKernel(smooth, x_size=smooth * 5, y_size=smooth * 5)
+        elif kernel == 'box':
+            kernel = Box2DKernel(smooth, x_size=smooth * 5, y_size=smooth * 5)
+        else:
+            raise ValueError("Unknown kernel: {0}".format(kernel))
+
+    if isinstance(kernel, Kernel):
+        kernel_array = kernel.array
+    else:
+        kernel_array = np.asarray(kernel, dtype=float)
+
+    return kernel, kernel_array
+
+
+def kernel_halo(smooth=3, kernel='gauss'):
+    """
+    Return the number of pixels on either side of a pixel that contribute to
+    its smoothed value in :func:`convolve`.
+    """
+    if smooth is None and isinstance(kernel, str) and kernel in ['box', 'gauss']:
+        return 0
+    kernel_array = _make_kernel(smooth, kernel)[1]
+    return max(kernel_array.shape) // 2
+
+
+def _convolve(image, kernel, kernel_array):
+    # Convolve an image in which any Inf values have already been converted
+    # to NaN, selecting the most efficient algorithm.
+
+    # The faster algorithms are only used for positive kernels, for which
+    # the normalization of the results is well defined, and for the same
+    # kernel shapes as supported by astropy.
+    if (image.ndim != 2 or kernel_array.ndim != 2 or
+            kernel_array.shape[0] % 2 == 0 or kernel_array.shape[1] % 2 == 0 or
+            np.any(kernel_array < 0) or not kernel_array.sum() > 0):
+        return astropy_convolve(image, kernel, boundary='extend')
+
+    separable = _separate(kernel_array)
+
+    if separable is None and kernel_array.size < FFT_MIN_SIZE:
+        return astropy_convolve(image, kernel, boundary='extend')
+
+    # NaN values are ignored by convolving the image with NaN values set to
+    # zero, and normalizing by the convolution of the mask of valid values.
+    # Note that the image may be shared with other threads, so we don't
+    # modify it in-place.
+    valid = ~np.isnan(image)
+    has_nan = not np.all(valid)
+    image = np.where(valid, image, 0.)
+
+    if separable is None:
+        if has_nan:
+            result, weights = _convolve_fft([image, valid.astype(float)],
+                                            kernel_array)
+        else:
+            result, = _convolve_fft([image], kernel_array)
+    else:
+        result = _convolve_separable(image, *separable)
+        if has_nan:
+            weights = _convolve_separable(valid.astype(float), *separable)
+
+    if has_nan:
+        # Values that are only surrounded by NaN values remain NaN
+        weights[weights < kernel_array.sum() * 1e-8] = np.nan
+        result /= weights
+    else:
+        result /= kernel_array.sum()
+
+    return result
+
+
+def convolve(image, smooth=3, kernel='gauss', max_workers=None):
+    """
+    Smooth an image, ignoring NaN values (which are replaced by the
+    weighted average of the surrounding values).
+
+    This gives the same results as :func:`astropy.convolution.convolve` with
+    ``boundary='extend'``, but the algorithm is selected automatically:
+    separable kernels (including the built-in 'gauss' and 'box' kernels)
+    are applied as two one-dimensional passes, and other large kernels are
+    applied using FFTs.
 
-def convolve(image, smooth=3, kernel='gauss'):
+    The image is split into bands of rows which are convolved in parallel.
+    Each band is extended by half the kernel size on either side (using
+    the neighboring rows of the image), so that the result is the same (to
+    within rounding errors) as convolving the whole image at once.
+
+    Parameters
+    ----------
+    image : array-like
+        The two-dimensional image to smooth.
+    smooth : int, optional
+        The size of the built-in kernels.
+    kernel : { 'gauss', 'box', numpy.array }, optional
+        The kernel to use.
+    max_workers : int, optional
+        The maximum number of threads to use. Defaults to the number of CPUs.
+    """
 
     if smooth is None and isinstance(kernel, str) and kernel in ['box', 'gauss']:
         return image
@@ -18,16 +211,34 @@ def convolve(image, smooth=3, kernel='gauss'):
     # convert to NaN here.
 
     image_fixed = np.array(image, dtype=float, copy=True)
-    image_fixed[np.isinf(image)] = np.nan
+    image_fixed[np.isinf(image_fixed)] = np.nan
 
-    if isinstance(kernel, str):
-        if kernel == 'gauss':
-            kernel = Gaussian2DKernel(smooth, x_size=smooth * 5, y_size=smooth * 5)
-        elif kernel == 'box':
-            kernel = Box2DKernel(smooth, x_size=smooth * 5, y_size=smooth * 5)
-        else:
-            raise ValueError("Unknown kernel: {0}".format(kernel))
+    kernel, kernel_array = _make_kernel(smooth, kernel)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    # Split the image into bands that are at least as tall as the kernel,
+    # since otherwise most of the work would be spent on the halos.
+    ny = image_fixed.shape[0]
+    if image_fixed.ndim == 2 and kernel_array.ndim == 2:
+        n_bands = min(max_workers * CHUNKS_PER_WORKER, ny // kernel_array.shape[0])
     else:
-        kernel = kernel
+        n_bands = 1
+
+    if max_workers == 1 or n_bands < 2:
+        return _convolve(image_fixed, kernel, kernel_array)
+
+    halo = kernel_array.shape[0] // 2
+
+    def convolve_band(start, stop):
+        band_start, band_stop = max(start - halo, 0), min(stop + halo, ny)
+        result = _convolve(image_fixed[band_start:band_stop], kernel, kernel_array)
+        return result[start - band_start:stop - band_start]
+
+    edges = np.linspace(0, ny, n_bands + 1).astype(int)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        bands = list(executor.map(convolve_band, edges[:-1], edges[1:]))
 
-    return astropy_convolve(image, kernel, boundary='extend')
+    return np.concatenate(bands)
@@ -7,6 +7,7 @@ import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.patches import Circle, Rectangle, Ellipse, Polygon, FancyArrow
 from matplotlib.collections import PatchCollection, LineCollection
+from matplotlib.image import AxesImage
 
 import numpy as np
 
@@ -14,19 +15,21 @@ from astropy import log
 from astropy.wcs import WCS
 from astropy.wcs.utils import proj_plane_pixel_scales
 from astropy.io import fits
+from astropy.nddata import NDData
 
-try:
-    from astropy.nddata.blocks import block_reduce
-except ImportError:  # astropy<5
-    from astropy.nddata.utils import block_reduce
-
-from astropy.visualization import AsymmetricPercentileInterval
 from astropy.visualization.wcsaxes import WCSAxes, WCSAxesSubplot
+from astropy.visualization.wcsaxes.utils import transform_contour_set_inplace
 from astropy.coordinates import ICRS
 
+from . import cache_util
+from . import contour_util
 from . import convolve_util
+from . import downsample_util
 from . import header as header_util
+from . import interval_util
+from . import lut_util
 from . import slicer
+from . import tile_util
 
 from astropy.visualization import simple_norm
 from .layers import Layers
@@ -38,16 +41,105 @@ from .overlays import Beam, Scalebar
 from .regions import Regions
 from .colorbar import Colorbar
 from .frame import Frame
+from .pyramid import ImagePyramid, PyramidImage
+from .contour_layer import ContourLayer
+from .prerender import PrerenderedImage
 
 from .decorators import auto_refresh, fixdocstring
 
 HDU_TYPES = tuple([fits.PrimaryHDU, fits.ImageHDU, fits.CompImageHDU])
 
+# Options of Axes.contour that only apply to the Matplotlib contouring
+# algorithms
+QUAD_CONTOUR_KWARGS = ('algorithm', 'corner_mask', 'nchunk', 'origin', 'extent')
+
 
 __doctest_skip__ = ['FITSFigure.add_beam', 'FITSFigure.add_colorbar',
                     'FITSFigure.add_grid', 'FITSFigure.add_scalebar']
 
 
+def _is_array_like(data):
+    """
+    Whether an object can be treated as an array without copying it.
+    """
+    if (hasattr(data, '__array__') and hasattr(data, 'shape') and
+            hasattr(data, '__getitem__')):
+        return True
+    try:
+        memoryview(data)
+    except TypeError:
+        return False
+    else:
+        return True
+
+
+def _as_array(data):
+    """
+    Evaluate lazy array-like objects (including FITS sections) as Numpy
+    arrays. Numpy arrays are not copied.
+    """
+    if isinstance(data, np.ndarray) or hasattr(data, '__array__'):
+        return np.asarray(data)
+    else:
+        return data[...]
+
+
+def _cutout_slices(header, cutout, frame, dimensions=[0, 1]):
+    """
+    Find the range of pixels to extract along the two image dimensions for a
+    cutout given by (x, y, radius) or (x, y, width, height).
+    """
+
+    if len(cutout) == 3:
+        x, y, radius = cutout
+        width = height = 2 * radius
+    elif len(cutout) == 4:
+        x, y, width, height = cutout
+    else:
+        raise ValueError("cutout= should be a tuple of three (x, y, radius) "
+                         "or four (x, y, width, height) values")
+
+    if frame == 'pixel':
+        xpix, ypix = x, y
+        dx_pix = width * 0.5
+        dy_pix = height * 0.5
+    elif frame == 'world':
+        wcs = WCS(header, relax=True).sub([dimensions[0] + 1,
+                                           dimensions[1] + 1])
+        xpix, ypix = wcs.wcs_world2pix(x, y, 0)
+        sx, sy = proj_plane_pixel_scales(wcs)
+        dx_pix = width / sx * 0.5
+        dy_pix = height / sy * 0.5
+    else:
+        raise ValueError("cutout_frame should be set to 'pixel' or 'world'")
+
+    nx = header['NAXIS%i' % (dimensions[0] + 1)]
+    ny = header['NAXIS%i' % (dimensions[1] + 1)]
+
+    # Pixel i covers the range i - 0.5 to i + 0.5
+    xmin = max(int(np.floor(xpix - dx_pix + 0.5)), 0)
+    xmax = min(int(np.floor(xpix + dx_pix + 0.5)) + 1, nx)
+    ymin = max(int(np.floor(ypix - dy_pix + 0.5)), 0)
+    ymax = min(int(np.floor(ypix + dy_pix + 0.5)) + 1, ny)
+
+    if xmin >= xmax or ymin >= ymax:
+        raise Exception("Cutout region falls outside the image")
+
+    return slice(xmin, xmax), slice(ymin, ymax)
+
+
+def _mask_to_nan(data, mask):
+    """
+    Set masked values to NaN. The data is only copied if any values are
+    masked.
+    """
+    if mask is None or mask is np.ma.nomask or not np.any(mask):
+        return data
+    data = np.array(data, dtype=float)
+    data[np.broadcast_to(mask, data.shape)] = np.nan
+    return data
+
+
 def uniformize_1d(*args):
     if len(args) > 1:
         return np.broadcast_arrays(np.atleast_1d(args[0]), *args[1:])
@@ -74,10 +166,20 @@ class FITSFigure(Layers, Regions):
              string
              astropy.io.fits.PrimaryHDU
              astropy.io.fits.ImageHDU
+             astropy.io.fits.Header
              astropy.wcs.WCS
-             np.ndarray
+             astropy.nddata.NDData (e.g. CCDData)
+             np.ndarray, or any array-like object (e.g. np.memmap,
+             masked arrays, or dask arrays)
              RGB image with AVM meta-data
 
+        Array-like objects are not copied. Masked values are set to NaN,
+        and the WCS of NDData objects is used if present.
+
+        If a WCS object or a header is passed, no data is allocated, so that
+        the figure can be used e.g. to overlay contours or markers even for
+        very large WCS grids.
+
     hdu : int, optional
         By default, the image in the primary HDU is read in. If a
         different HDU is required, use this argument.
@@ -98,9 +200,18 @@ class FITSFigure(Layers, Regions):
         width and height. For example, [0.1, 0.1, 0.8, 0.8] will almost
         fill the entire figure, leaving a 10 percent margin on all sides.
 
-    downsample : int, optional
+    downsample : int or tuple, optional
         If this option is specified, the image will be downsampled
-        by a factor *downsample* when reading in the data.
+        by a factor *downsample* when reading in the data. A tuple of two
+        values can be given to use different factors along x and y. The
+        downsampling is done one band of rows at a time, so when combined
+        with ``lazy=True`` the full-resolution image is never loaded into
+        memory.
+
+    downsample_func : str, optional
+        The function used to combine pixels when downsampling. This can be
+        one of 'nanmean' (the default), 'mean', 'nanmedian', 'median',
+        'nanmax', 'max', 'nansum', or 'sum'.
 
     north : bool, optional
         Whether to rotate the image so that north is up. By default, this is
@@ -130,6 +241,42 @@ class FITSFigure(Layers, Regions):
         APLpy is being used from IPython and the Matplotlib backend is
         interactive.
 
+    lazy : bool, optional
+        If a filename is specified, only read the requested two-dimensional
+        slice from disk (using memory-mapping where possible) rather than
+        loading the whole array into memory. This is recommended for large
+        files and cubes. The same setting is used by show_contour and
+        show_vectors when they are given filenames.
+
+    cutout : tuple, optional
+        If specified, only this region of the image is read in, and the WCS
+        is adjusted accordingly. This should be a tuple of three values
+        ``(x, y, radius)`` for a square region, or four values
+        ``(x, y, width, height)`` for a rectangular region. When combined
+        with ``lazy=True``, only the data in the region is read from disk.
+
+    cutout_frame : str, optional
+        Whether the cutout position and size are given in 'world'
+        coordinates (the default, in the units of the WCS, which is often
+        degrees) or in 'pixel' coordinates.
+
+    raw : bool, optional
+        If set, 8- and 16-bit integer data is kept as raw integers rather
+        than being converted to floating-point values. For files, the
+        scaling given by the BSCALE, BZERO, and BLANK keywords is then
+        only applied when showing the image, through a lookup table with
+        one entry per possible raw value that combines the scaling, the
+        stretch, and the colormap, and percentiles are computed exactly
+        from a histogram of the raw values. This reduces the memory needed
+        to show raw detector frames. Other data is not affected.
+
+    smooth_cache_size : int, optional
+        The maximum total size in bytes of the smoothed images kept by the
+        figure, so that showing the same data with the same smoothing
+        again does not smooth it again. Defaults to
+        ``aplpy.convolve_util.CACHE_SIZE`` (256 MB). Smoothed images larger
+        than this are not kept, and setting this to zero disables caching.
+
     kwargs
         Any additional arguments are passed on to matplotlib's Figure()
         class. For example, to set the figure size, use the
@@ -141,11 +288,19 @@ class FITSFigure(Layers, Regions):
 
     @auto_refresh
     def __init__(self, data, hdu=0, figure=None, subplot=(1, 1, 1),
-                 downsample=False, north=False, convention=None,
+                 downsample=False, downsample_func='nanmean',
+                 north=False, convention=None,
                  dimensions=[0, 1], slices=[], auto_refresh=None,
-                 **kwargs):
+                 lazy=False, cutout=None, cutout_frame='world', raw=False,
+                 smooth_cache_size=None, **kwargs):
 
         self._wcsaxes_slices = ('x', 'y')
+        self._hdulists = []
+        self._lazy = lazy
+
+        # The scaling from raw integer values to physical values, if the data
+        # is kept as raw integers (see lut_util.IntegerScaling)
+        self._scaling = None
 
         if 'figsize' not in kwargs:
             kwargs['figsize'] = (10, 9)
@@ -166,7 +321,8 @@ class FITSFigure(Layers, Regions):
             self._rgb_image = data
 
             # Find image size
-            nx, ny = Image.open(data).size
+            with Image.open(data) as image:
+                nx, ny = image.size
 
             # Now convert AVM information to WCS
             data = AVM.from_image(data).to_wcs()
@@ -181,6 +337,13 @@ class FITSFigure(Layers, Regions):
             data.ny = ny
             data.pixel_shape = (nx, ny)
 
+        if isinstance(data, fits.Header):
+
+            header = data
+            data = WCS(header, relax=True)
+            if header.get('NAXIS', 0) == 2:
+                data.pixel_shape = header['NAXIS1'], header['NAXIS2']
+
         if isinstance(data, WCS):
 
             wcs = data
@@ -198,7 +361,13 @@ class FITSFigure(Layers, Regions):
             header['NAXIS1'], header['NAXIS2'] = wcs.pixel_shape
             nx = header['NAXIS%i' % (dimensions[0] + 1)]
             ny = header['NAXIS%i' % (dimensions[1] + 1)]
-            self._data = np.zeros((ny, nx), dtype=float)
+
+            # The data values are never needed for WCS-only figures, so we use
+            # a read-only view of a single zero rather than allocating the
+            # full array (the values are only materialized if e.g.
+            # show_colorscale is called).
+            self._data = np.broadcast_to(np.zeros(1), (ny, nx))
+
             self._header = header
             self._wcs = WCS(header, relax=True)
             self._wcs.nx = nx
@@ -214,21 +383,52 @@ class FITSFigure(Layers, Regions):
                             "passed is a WCS object")
                 north = False
 
+            if cutout is not None:
+                log.warning("cutout argument is ignored if data "
+                            "passed is a WCS object")
+
         else:
 
-            self._data, self._header, self._wcs, self._wcsaxes_slices = \
-                self._get_hdu(data, hdu, north, convention=convention,
-                              dimensions=dimensions, slices=slices)
-            self._wcs.nx = self._header['NAXIS%i' % (dimensions[0] + 1)]
-            self._wcs.ny = self._header['NAXIS%i' % (dimensions[1] + 1)]
+            # Make sure that files are closed if reading the data fails,
+            # since the caller cannot close the figure in that case
+            try:
+                self._data, self._header, self._wcs, self._wcsaxes_slices = \
+                    self._get_hdu(data, hdu, north, convention=convention,
+                                  dimensions=dimensions, slices=slices,
+                                  lazy=lazy, cutout=cutout,
+                                  cutout_frame=cutout_frame, raw=raw)
+                self._wcs.nx = self._header['NAXIS%i' % (dimensions[0] + 1)]
+                self._wcs.ny = self._header['NAXIS%i' % (dimensions[1] + 1)]
+            except BaseException:
+                self._close_files()
+                raise
+
+        try:
 
-        # Downsample if requested
-        if downsample:
-            nx_new = self._wcs.nx - np.mod(self._wcs.nx, downsample)
-            ny_new = self._wcs.ny - np.mod(self._wcs.ny, downsample)
-            self._data = self._data[0:ny_new, 0:nx_new]
-            self._data = block_reduce(self._data, downsample, func=np.mean)
-            self._wcs.nx, self._wcs.ny = nx_new, ny_new
+            # Downsample if requested
+            if downsample:
+                factor_x, factor_y = downsample_util.parse_factor(downsample)
+                # Raw integer data is scaled one band of rows at a time
+                if self._scaling is not None:
+                    self._data = lut_util.ScaledArray(self._data, self._scaling)
+                    self._scaling = None
+                nx_new = self._wcs.nx - np.mod(self._wcs.nx, factor_x)
+                ny_new = self._wcs.ny - np.mod(self._wcs.ny, factor_y)
+                self._data = downsample_util.downsample(self._data,
+                                                        (factor_x, factor_y),
+                                                        func=downsample_func)
+                self._wcs.nx, self._wcs.ny = nx_new, ny_new
+
+            # If a lazy array-like object was passed, we only evaluate it now,
+            # once the data has been sliced and downsampled. This does not
+            # copy Numpy arrays.
+            self._data = _as_array(self._data)
+
+        finally:
+
+            # The data is now fully read in (or memory-mapped), or an error
+            # occurred, so we no longer need the file handles
+            self._close_files()
 
         # Open the figure
         if figure:
@@ -282,11 +482,43 @@ class FITSFigure(Layers, Regions):
         # Set image holder to be empty
         self.image = None
 
+        # Histograms used to determine limits automatically, keyed by the
+        # identity of the data
+        self._histograms = {}
+
+        # Automatically determined limits, keyed by the identity of the data
+        # and the percentiles, so that restyling never reads the data again
+        self._auto_limits = {}
+
+        # Smoothed versions of the data, keyed by the identity of the data
+        # and the smoothing parameters
+        if smooth_cache_size is None:
+            smooth_cache_size = convolve_util.CACHE_SIZE
+        self._smoothed = cache_util.LRUCache(smooth_cache_size,
+                                             sizeof=lambda array: array.nbytes)
+
+        # The most recent image pyramid, and the key (the identity of the
+        # data, the smoothing parameters and the pyramid file) it was
+        # computed for
+        self._pyramid = None
+
         # Set default theme
         self.set_theme(theme='pretty')
 
     def _get_hdu(self, data, hdu, north, convention=None,
-                 dimensions=[0, 1], slices=[]):
+                 dimensions=[0, 1], slices=[], lazy=False, cutout=None,
+                 cutout_frame='world', raw=False):
+
+        # Whether the data should be read through the HDU section, which only
+        # reads the requested part of the array from disk
+        use_section = False
+
+        # The key used to cache the parsed header and WCS for files
+        cache_key = None
+        parsed = None
+
+        # The scaling of raw integer data, if applicable
+        scaling = None
 
         if isinstance(data, str):
 
@@ -296,22 +528,34 @@ class FITSFigure(Layers, Regions):
             if not os.path.exists(filename):
                 raise IOError("File not found: " + filename)
 
-            # Read in FITS file
+            # Read in FITS file. If raw data is requested, the scaling is not
+            # applied when reading the data.
+            open_raw = raw and not north
             try:
-                hdulist = fits.open(filename)
+                hdulist = fits.open(filename, do_not_scale_image_data=open_raw)
             except Exception:
                 raise IOError("An error occurred while reading the FITS file")
 
+            # Keep track of open files so that they can be closed
+            # deterministically once the data has been read in (see
+            # _close_files)
+            self._hdulists.append(hdulist)
+
+            hdu_key = hdu
+
             # Check whether the HDU specified contains any data, otherwise
-            # cycle through all HDUs to find one that contains valid image data
-            if hdulist[hdu].data is None:
+            # cycle through all HDUs to find one that contains valid image
+            # data. We only look at the headers here, since accessing .data
+            # would read (and scale or decompress) each array.
+            if not header_util.has_data(hdulist[hdu].header):
                 found = False
                 for alt_hdu in range(len(hdulist)):
                     if isinstance(hdulist[alt_hdu], HDU_TYPES):
-                        if hdulist[alt_hdu].data is not None:
+                        if header_util.has_data(hdulist[alt_hdu].header):
                             log.warning("hdu=%i does not contain any data, "
                                         "using hdu=%i instead" % (hdu, alt_hdu))
                             hdu = hdulist[alt_hdu]
+                            hdu_key = alt_hdu
                             found = True
                             break
                 if not found:
@@ -320,9 +564,30 @@ class FITSFigure(Layers, Regions):
             else:
                 hdu = hdulist[hdu]
 
-        elif type(data) is np.ndarray:
-
-            hdu = fits.ImageHDU(data)
+            # If requested, 8- and 16-bit integer data is read in without
+            # applying BSCALE and BZERO, which are instead applied through
+            # the lookup table used to show the image. Other data is read
+            # in again with the scaling applied, if it has any.
+            if open_raw:
+                if (isinstance(hdu, (fits.PrimaryHDU, fits.ImageHDU)) and
+                        hdu.header['BITPIX'] in (8, 16)):
+                    scaling = lut_util.IntegerScaling.from_header(hdu.header)
+                elif any(keyword in hdu.header for keyword in ('BSCALE', 'BZERO', 'BLANK')):
+                    hdulist = fits.open(filename)
+                    self._hdulists.append(hdulist)
+                    hdu = hdulist[hdu_key]
+
+            # Tile-compressed images are always read through a section, since
+            # this only decompresses the tiles needed (in parallel)
+            use_section = ((lazy or isinstance(hdu, fits.CompImageHDU))
+                           and not north)
+
+            if not north:
+                cache_key = (cache_util.file_key(filename), hdu_key,
+                             tuple(dimensions), convention,
+                             None if cutout is None else tuple(float(value) for value in cutout),
+                             cutout_frame, scaling is not None)
+                parsed = cache_util.get_parsed(cache_key)
 
         elif isinstance(data, HDU_TYPES):
 
@@ -332,12 +597,77 @@ class FITSFigure(Layers, Regions):
 
             hdu = data[hdu]
 
+        elif isinstance(data, NDData):
+
+            # Arrays with masks and WCS information, e.g. CCDData
+            hdu = None
+            if isinstance(data.wcs, WCS):
+                header = data.wcs.to_header(relax=True)
+            else:
+                header = None
+            data = _mask_to_nan(data.data, data.mask)
+
+        elif isinstance(data, np.ndarray) or _is_array_like(data):
+
+            # Any array-like object, including Numpy array sub-classes (such
+            # as memory-mapped arrays) and lazy arrays (such as dask arrays).
+            # These are not copied, and any slicing and downsampling is done
+            # on the original object.
+            hdu = None
+            header = None
+            if isinstance(data, np.ma.MaskedArray):
+                data = _mask_to_nan(data.data, data.mask)
+            elif not hasattr(data, '__array__'):
+                # Objects only supporting the buffer protocol
+                data = np.asarray(data)
+
         else:
 
             raise Exception("data argument should either be a filename, an HDU object from astropy.io.fits, a WCS object from astropy.wcs, or a Numpy array.")
 
+        if hdu is None:
+
+            # Construct a minimal header describing the array
+            if header is None:
+                header = fits.Header()
+            ndim = len(data.shape)
+            header['NAXIS'] = ndim
+            for idim in range(ndim):
+                header['NAXIS%i' % (idim + 1)] = data.shape[ndim - 1 - idim]
+
+        else:
+
+            # Now copy the header to a new object, since in astropy.io.fits
+            # the data and header are linked, which can lead to confusing
+            # behavior. We just need to copy the header to avoid memory issues
+            # - as long as one item is copied, the two variables are
+            # decoupled.
+            if use_section and isinstance(hdu, fits.CompImageHDU):
+                data = tile_util.TiledSection(hdu)
+            elif use_section:
+                data = hdu.section
+            else:
+                data = hdu.data
+            if parsed is None:
+                header = hdu.header.copy()
+                # The scaling keywords do not apply to the physical values
+                if scaling is not None:
+                    for keyword in ('BSCALE', 'BZERO', 'BLANK'):
+                        header.remove(keyword, ignore_missing=True)
+            else:
+                header, wcs, cutout_slices = parsed
+
+        del hdu
+
+        # Other 8- and 16-bit integer data does not need to be scaled, but can
+        # still be shown through a lookup table
+        if raw and scaling is None and not north:
+            dtype = getattr(data, 'dtype', None)
+            if dtype is not None and dtype.kind in 'iu' and dtype.itemsize <= 2:
+                scaling = lut_util.IntegerScaling(dtype)
+
         # Check that we have at least 2-dimensional data
-        if hdu.header['NAXIS'] < 2:
+        if header['NAXIS'] < 2:
             raise ValueError("Data should have at least two dimensions")
 
         # Check dimensions= argument
@@ -345,10 +675,10 @@ class FITSFigure(Layers, Regions):
             raise ValueError('dimensions= should be a list or a tuple')
         if len(set(dimensions)) != 2 or len(dimensions) != 2:
             raise ValueError("dimensions= should be a tuple of two different values")
-        if dimensions[0] < 0 or dimensions[0] > hdu.header['NAXIS'] - 1:
-            raise ValueError('values of dimensions= should be between %i and %i' % (0, hdu.header['NAXIS'] - 1))
-        if dimensions[1] < 0 or dimensions[1] > hdu.header['NAXIS'] - 1:
-            raise ValueError('values of dimensions= should be between %i and %i' % (0, hdu.header['NAXIS'] - 1))
+        if dimensions[0] < 0 or dimensions[0] > header['NAXIS'] - 1:
+            raise ValueError('values of dimensions= should be between %i and %i' % (0, header['NAXIS'] - 1))
+        if dimensions[1] < 0 or dimensions[1] > header['NAXIS'] - 1:
+            raise ValueError('values of dimensions= should be between %i and %i' % (0, header['NAXIS'] - 1))
 
         # Reproject to face north if requested
         if north:
@@ -356,25 +686,16 @@ class FITSFigure(Layers, Regions):
             # Find rotated WCS
             frame = ICRS() if north is True else north
             from reproject.mosaicking import find_optimal_celestial_wcs
-            wcs, shape = find_optimal_celestial_wcs([hdu], frame=frame)
+            wcs, shape = find_optimal_celestial_wcs([(np.asarray(data), header)],
+                                                    frame=frame)
 
             from reproject import reproject_interp
-            data, _ = reproject_interp(hdu, wcs, shape_out=shape)
+            data, _ = reproject_interp((np.asarray(data), header), wcs,
+                                       shape_out=shape)
             header = wcs.to_header()
             header['NAXIS1'] = shape[1]
             header['NAXIS2'] = shape[0]
 
-        else:
-
-            # Now copy the data and header to new objects, since in astropy.io.fits
-            # the two attributes are linked, which can lead to confusing behavior.
-            # We just need to copy the header to avoid memory issues - as long as
-            # one item is copied, the two variables are decoupled.
-            data = hdu.data
-            header = hdu.header.copy()
-
-        del hdu
-
         # If slices wasn't specified, check if we can guess
         shape = data.shape
         if len(shape) > 2:
@@ -385,17 +706,37 @@ class FITSFigure(Layers, Regions):
                 slices = [0 for i in range(1, len(shape) - 1)]
                 log.info("Setting slices=%s" % str(slices))
 
+        if parsed is None:
+
+            # Check header
+            header = header_util.check(header, convention=convention,
+                                       dimensions=dimensions)
+
+            # Find the range of pixels to extract if a cutout was requested,
+            # and update the header accordingly
+            if cutout is None:
+                cutout_slices = None
+            else:
+                cutout_slices = _cutout_slices(header, cutout, cutout_frame,
+                                               dimensions=dimensions)
+                for dim, cut in zip(dimensions, cutout_slices):
+                    header['CRPIX%i' % (dim + 1)] = header.get('CRPIX%i' % (dim + 1), 0.) - cut.start
+                    header['NAXIS%i' % (dim + 1)] = cut.stop - cut.start
+
+            # Parse WCS info
+            wcs = WCS(header, relax=True)
+
+            if cache_key is not None:
+                cache_util.set_parsed(cache_key, header, wcs, cutout_slices)
+
         # Extract slices
         data, wcsaxes_slices = slicer.slice_hypercube(data, header,
                                                       dimensions=dimensions,
-                                                      slices=slices)
-
-        # Check header
-        header = header_util.check(header, convention=convention,
-                                   dimensions=dimensions)
+                                                      slices=slices,
+                                                      cutout=cutout_slices)
 
-        # Parse WCS info
-        wcs = WCS(header, relax=True)
+        if raw:
+            self._scaling = scaling
 
         return data, header, wcs, wcsaxes_slices
 
@@ -505,7 +846,8 @@ class FITSFigure(Layers, Regions):
                        pmin=0.25, pmax=99.75,
                        stretch='linear', exponent=2, invert='default',
                        smooth=None, kernel='gauss', aspect='equal',
-                       interpolation='nearest'):
+                       interpolation='nearest', pyramid=False,
+                       interval='percentile', lut=False, prerender=False):
         """
         Show a grayscale image of the FITS file.
 
@@ -569,6 +911,43 @@ class FITSFigure(Layers, Regions):
             will be output at native resolution irrespective of the dpi
             setting), 'bilinear', 'bicubic', and many more (see the
             matplotlib documentation for imshow).
+
+        pyramid : bool or str, optional
+            Whether to compute a multi-resolution pyramid of the image. When
+            drawing, the coarsest level that still has at least the
+            resolution of the output for the current view is shown, which
+            speeds up drawing for large images. If a string is given, this
+            should be the filename of a FITS file in which to save the
+            pyramid, or from which to read it if it already exists and
+            matches the data. The pyramid is re-used when the image is
+            shown again with the same smoothing, so the data of the figure
+            should not be modified in place.
+
+        interval : { 'percentile', 'zscale', 'sigclip' }, optional
+            The method used to determine vmin and/or vmax if they are set
+            to None. 'percentile' (default) uses the pmin and pmax
+            percentiles of the data, 'zscale' uses the IRAF zscale
+            algorithm, and 'sigclip' uses the sigma-clipped median minus
+            and plus three times the sigma-clipped standard deviation. The
+            last two are computed on a fixed-size sample of the pixels, so
+            are fast even for large images.
+
+        lut : bool, optional
+            Whether to quantize the data into 65535 levels between vmin and
+            vmax, and store the image as 16-bit indices of these levels. The
+            indices are then mapped to colors using a lookup table computed
+            once for all levels, so that non-linear stretches are as fast to
+            draw as linear ones, and the image takes up a quarter of the
+            memory. This cannot be combined with pyramid.
+
+        prerender : bool, optional
+            Whether to convert the image to 8-bit RGBA values once, and only
+            resample these when drawing, rather than normalizing and
+            colormapping every pixel each time the figure is drawn or saved.
+            The RGBA values are only computed again if the colorscale is
+            changed, e.g. with show_colorscale, set_nan_color, or set_theme.
+            If interpolation is used, the colors rather than the data values
+            are interpolated. This cannot be combined with pyramid.
         """
 
         if invert == 'default':
@@ -583,7 +962,8 @@ class FITSFigure(Layers, Regions):
                              pmin=pmin, pmax=pmax,
                              stretch=stretch, exponent=exponent, cmap=cmap,
                              smooth=smooth, kernel=kernel, aspect=aspect,
-                             interpolation=interpolation)
+                             interpolation=interpolation, pyramid=pyramid,
+                             interval=interval, lut=lut, prerender=prerender)
 
     @auto_refresh
     def hide_grayscale(self, *args, **kwargs):
@@ -593,7 +973,9 @@ class FITSFigure(Layers, Regions):
     def show_colorscale(self, vmin=None, vmid=None, vmax=None, pmin=0.25,
                         pmax=99.75, stretch='linear', exponent=2,
                         cmap='default', smooth=None, kernel='gauss',
-                        aspect='equal', interpolation='nearest'):
+                        aspect='equal', interpolation='nearest',
+                        pyramid=False, interval='percentile', lut=False,
+                        prerender=False):
         """
         Show a colorscale image of the FITS file.
 
@@ -655,7 +1037,52 @@ class FITSFigure(Layers, Regions):
             will be output at native resolution irrespective of the dpi
             setting), 'bilinear', 'bicubic', and many more (see the
             matplotlib documentation for imshow).
-        """
+
+        pyramid : bool or str, optional
+            Whether to compute a multi-resolution pyramid of the image. When
+            drawing, the coarsest level that still has at least the
+            resolution of the output for the current view is shown, which
+            speeds up drawing for large images. If a string is given, this
+            should be the filename of a FITS file in which to save the
+            pyramid, or from which to read it if it already exists and
+            matches the data. The pyramid is re-used when the image is
+            shown again with the same smoothing, so the data of the figure
+            should not be modified in place.
+
+        interval : { 'percentile', 'zscale', 'sigclip' }, optional
+            The method used to determine vmin and/or vmax if they are set
+            to None. 'percentile' (default) uses the pmin and pmax
+            percentiles of the data, 'zscale' uses the IRAF zscale
+            algorithm, and 'sigclip' uses the sigma-clipped median minus
+            and plus three times the sigma-clipped standard deviation. The
+            last two are computed on a fixed-size sample of the pixels, so
+            are fast even for large images.
+
+        lut : bool, optional
+            Whether to quantize the data into 65535 levels between vmin and
+            vmax, and store the image as 16-bit indices of these levels. The
+            indices are then mapped to colors using a lookup table computed
+            once for all levels, so that non-linear stretches are as fast to
+            draw as linear ones, and the image takes up a quarter of the
+            memory. This cannot be combined with pyramid.
+
+        prerender : bool, optional
+            Whether to convert the image to 8-bit RGBA values once, and only
+            resample these when drawing, rather than normalizing and
+            colormapping every pixel each time the figure is drawn or saved.
+            The RGBA values are only computed again if the colorscale is
+            changed, e.g. with show_colorscale, set_nan_color, or set_theme.
+            If interpolation is used, the colors rather than the data values
+            are interpolated. This cannot be combined with pyramid.
+        """
+
+        interval_util.validate_interval(interval)
+
+        if lut and pyramid:
+            raise ValueError("lut= and pyramid= cannot be used together")
+
+        if prerender and pyramid:
+            raise ValueError("prerender= and pyramid= cannot be used together")
 
         if cmap == 'default':
             cmap = self._get_colormap_default()
@@ -668,11 +1095,12 @@ class FITSFigure(Layers, Regions):
 
         if min_auto or max_auto:
 
-            interval = AsymmetricPercentileInterval(pmin, pmax, n_samples=10000)
-            try:
-                vmin_auto, vmax_auto = interval.get_limits(self._data)
-            except (IndexError, TypeError):  # no valid values
-                vmin_auto = vmax_auto = 0
+            if interval == 'percentile':
+                vmin_auto, vmax_auto = self._get_auto_limits(pmin, pmax)
+            else:
+                vmin_auto, vmax_auto = interval_util.sample_limits(self._data,
+                                                                   interval,
+                                                                   scaling=self._scaling)
 
             if min_auto:
                 vmin = vmin_auto
@@ -721,20 +1149,79 @@ class FITSFigure(Layers, Regions):
         normalizer.vmin = vmin
         normalizer.vmax = vmax
 
+        # Raw integer data is shown as-is through a lookup table combining the
+        # scaling and the normalization, unless it needs to be smoothed
+        raw = (self._scaling is not None and not pyramid and smooth is None and
+               isinstance(kernel, str) and kernel in ['box', 'gauss'])
+
+        # If we are switching between different kinds of images (normal,
+        # pyramid, pre-rendered, or through a lookup table), we need to
+        # create a new image
+        if pyramid:
+            image_class = PyramidImage
+        elif prerender:
+            image_class = PrerenderedImage
+        elif lut or raw:
+            image_class = lut_util.LUTImage
+        else:
+            image_class = AxesImage
+        if self.image and type(self.image) is not image_class:
+            self.image.remove()
+            self.image = None
+
+        if raw:
+            convolved_data = self._data
+            normalizer = lut_util.LUTNormalize(normalizer, scaling=self._scaling)
+        else:
+            convolved_data = self._get_smoothed_data(smooth, kernel)
+            if lut:
+                convolved_data = lut_util.quantize(convolved_data, vmin, vmax)
+                normalizer = lut_util.LUTNormalize(normalizer)
+
+        # Interpolating the indices of the lookup table would mix in the index
+        # used for NaN values, so in that case we interpolate the colors.
+        if (lut or raw) and interpolation not in ('nearest', 'none'):
+            interpolation_stage = 'rgba'
+        else:
+            interpolation_stage = None
+
+        if pyramid:
+            image_pyramid = self._get_pyramid(pyramid, smooth, kernel)
+
+        extent = -0.5, self._wcs.nx - 0.5, -0.5, self._wcs.ny - 0.5
+
         if self.image:
             self.image.set_visible(True)
             self.image.set_norm(normalizer)
             self.image.set_cmap(cmap=cmap)
             self.image.origin = 'lower'
             self.image.set_interpolation(interpolation)
-            self.image.set_data(convolve_util.convolve(self._data,
-                                                       smooth=smooth,
-                                                       kernel=kernel))
+            self.image.set_interpolation_stage(interpolation_stage)
+            if pyramid:
+                self.image.set_pyramid(image_pyramid, extent)
+            else:
+                self.image.set_data(convolved_data)
+        elif pyramid:
+            self.image = PyramidImage(self.ax, image_pyramid, extent,
+                                      cmap=cmap, norm=normalizer,
+                                      interpolation=interpolation,
+                                      origin='lower')
+            self.image.set_clip_path(self.ax.patch)
+            self.ax.set_aspect(aspect)
+            self.ax.add_image(self.image)
+        elif image_class is not AxesImage:
+            self.image = image_class(self.ax, cmap=cmap, norm=normalizer,
+                                     interpolation=interpolation,
+                                     interpolation_stage=interpolation_stage,
+                                     origin='lower', extent=extent)
+            self.image.set_data(convolved_data)
+            self.image.set_clip_path(self.ax.patch)
+            self.ax.set_aspect(aspect)
+            self.ax.add_image(self.image)
         else:
-            extent = -0.5, self._wcs.nx - 0.5, -0.5, self._wcs.ny - 0.5
-            convolved_data = convolve_util.convolve(self._data, smooth=smooth, kernel=kernel)
             self.image = self.ax.imshow(convolved_data, cmap=cmap,
                                         interpolation=interpolation,
+                                        interpolation_stage=interpolation_stage,
                                         origin='lower', norm=normalizer,
                                         aspect=aspect, extent=extent)
 
@@ -749,6 +1236,70 @@ class FITSFigure(Layers, Regions):
         if hasattr(self, 'colorbar'):
             self.colorbar.update()
 
+    def _get_auto_limits(self, pmin, pmax):
+        """
+        Return the pmin and pmax percentiles of the data, re-using previously
+        computed limits, and the histogram of the data if it has already been
+        computed.
+        """
+        key = id(self._data)
+        limits_key = (key, pmin, pmax)
+        if limits_key not in self._auto_limits:
+            if key not in self._histograms:
+                if self._scaling is None:
+                    self._histograms[key] = interval_util.histogram(self._data)
+                else:
+                    self._histograms[key] = interval_util.integer_histogram(self._data,
+                                                                            self._scaling)
+            limits = interval_util.percentile_limits(self._data, pmin, pmax,
+                                                     hist=self._histograms[key])
+            self._auto_limits[limits_key] = limits
+        return self._auto_limits[limits_key]
+
+    def _get_scaled_data(self):
+        """
+        Return the physical values of the data, if the data is kept as raw
+        integers, and the data otherwise.
+        """
+        if self._scaling is None:
+            return self._data
+        else:
+            return self._scaling.scale(self._data)
+
+    def _get_smoothed_data(self, smooth, kernel):
+        """
+        Return the (scaled) data smoothed with the given parameters,
+        re-using the result if the same smoothing has already been done.
+        """
+        # Without smoothing, the data is returned as-is, and caching it
+        # would only evict smoothed images
+        if smooth is None and isinstance(kernel, str) and kernel in ['box', 'gauss']:
+            return self._get_scaled_data()
+        key = (id(self._data),) + convolve_util.kernel_key(smooth, kernel)
+        smoothed = self._smoothed.get(key)
+        if smoothed is None:
+            smoothed = convolve_util.convolve(self._get_scaled_data(),
+                                              smooth=smooth, kernel=kernel)
+            self._smoothed.set(key, smoothed)
+        return smoothed
+
+    def _get_pyramid(self, pyramid, smooth, kernel):
+        """
+        Return the pyramid of the data smoothed with the given parameters,
+        re-using the previous pyramid if it was computed for the same data,
+        smoothing, and pyramid file.
+        """
+        key = ((id(self._data),) + convolve_util.kernel_key(smooth, kernel) +
+               (pyramid if isinstance(pyramid, str) else None,))
+        if self._pyramid is None or self._pyramid[0] != key:
+            smoothed = self._get_smoothed_data(smooth, kernel)
+            if isinstance(pyramid, str):
+                image_pyramid = ImagePyramid.from_file(pyramid, smoothed)
+            else:
+                image_pyramid = ImagePyramid(smoothed)
+            self._pyramid = key, image_pyramid
+        return self._pyramid[1]
+
     @auto_refresh
     def hide_colorscale(self):
         self.image.set_visible(False)
@@ -803,27 +1354,30 @@ class FITSFigure(Layers, Regions):
 
         if filename is None:
             if hasattr(self, '_rgb_image'):
-                image = Image.open(self._rgb_image)
+                filename = self._rgb_image
             else:
                 raise Exception("Need to specify the filename of an RGB image")
-        else:
-            image = Image.open(filename)
 
-        if vertical_flip:
-            image = image.transpose(Image.FLIP_TOP_BOTTOM)
+        # The file is closed once the image has been read in, even if an
+        # error occurs
+        with Image.open(filename) as image:
 
-        if horizontal_flip:
-            image = image.transpose(Image.FLIP_LEFT_RIGHT)
+            if vertical_flip:
+                image = image.transpose(Image.FLIP_TOP_BOTTOM)
 
-        self.image = self.ax.imshow(image,
-                                    interpolation=interpolation,
-                                    origin='lower')
+            if horizontal_flip:
+                image = image.transpose(Image.FLIP_LEFT_RIGHT)
+
+            self.image = self.ax.imshow(image,
+                                        interpolation=interpolation,
+                                        origin='lower')
 
     @auto_refresh
     def show_contour(self, data=None, hdu=0, layer=None, levels=5,
                      filled=False, cmap=None, colors=None, returnlevels=False,
                      convention=None, dimensions=[0, 1], slices=[],
-                     smooth=None, kernel='gauss', overlap=False, **kwargs):
+                     smooth=None, kernel='gauss', overlap=False,
+                     simplify=None, min_area=None, reproject=False, **kwargs):
         """
         Overlay contours on the current plot.
 
@@ -839,7 +1393,8 @@ class FITSFigure(Layers, Regions):
                  astropy.io.fits.PrimaryHDU
                  astropy.io.fits.ImageHDU
                  astropy.wcs.WCS
-                 np.ndarray
+                 astropy.nddata.NDData (e.g. CCDData)
+                 np.ndarray, or any array-like object
 
         hdu : int, optional
             By default, the image in the primary HDU is read in. If a
@@ -848,7 +1403,10 @@ class FITSFigure(Layers, Regions):
         layer : str, optional
             The name of the contour layer. This is useful for giving
             custom names to layers (instead of contour_set_n) and for
-            replacing existing layers.
+            replacing existing layers. The layer, returned by
+            :meth:`get_layer`, is a :class:`~aplpy.contour_layer.ContourLayer`
+            which can be used to add or remove levels, or to change the
+            style of the contours, without recomputing existing contours.
 
         levels : int or list, optional
             This can either be the number of contour levels to compute
@@ -896,11 +1454,37 @@ class FITSFigure(Layers, Regions):
             specify if they would prefer 'gauss', 'box', or a custom
             kernel. All kernels are normalized to ensure flux retention.
 
-        overlap str, optional
+        overlap : bool, optional
             Whether to include only contours that overlap with the image
             area. This significantly speeds up the drawing of contours and
             reduces file size when using a file for the contours covering
-            a much larger area than the image.
+            a much larger area than the image. Only the part of the data
+            overlapping with the image is then read in and smoothed, so if
+            levels is an integer, the levels are determined from that part
+            of the data. This requires both the image and the contour data
+            to have celestial coordinates.
+
+        simplify : float, optional
+            If specified, the contours are simplified so that they deviate by
+            at most this many output pixels from the original contours,
+            which reduces the number of vertices to draw or save for
+            complex contours. The simplification is updated if the figure
+            is zoomed or saved with a different dpi.
+
+        min_area : float, optional
+            If specified, closed contours with an area smaller than this (in
+            square output pixels) are not shown.
+
+        reproject : bool, optional
+            Whether to resample the (smoothed) contour data onto the pixel
+            grid of the image before computing the contours. By default, the
+            contours are computed in the pixel coordinates of the contour
+            data, and are then transformed to the image coordinates (once,
+            when they are computed). Resampling is faster if the contour data
+            has many more pixels than the image or if levels are added often,
+            but the contours then have at most the resolution of the image.
+            This requires both the image and the contour data to have
+            celestial coordinates.
 
         kwargs
             Additional keyword arguments (such as alpha, linewidths, or
@@ -919,42 +1503,126 @@ class FITSFigure(Layers, Regions):
         elif not colors:
             cmap = plt.get_cmap('viridis')
 
+        # Pixel coordinates of the first column and row of the contoured data
+        x0, y0 = 0, 0
+
+        footprint = None
+        overlap_slices = None
+        reprojected = False
+
         if data is not None:
-            data_contour, header_contour, wcs_contour, wcsaxes_slices = \
-                self._get_hdu(data, hdu, False, convention=convention,
-                              dimensions=dimensions, slices=slices)
+
+            # The files are only needed until the data has been read in, and
+            # are closed even if an error occurs
+            try:
+                data_contour, header_contour, wcs_contour, wcsaxes_slices = \
+                    self._get_hdu(data, hdu, False, convention=convention,
+                                  dimensions=dimensions, slices=slices,
+                                  lazy=self._lazy)
+
+                wcs_contour.nx = header_contour['NAXIS%i' % (dimensions[0] + 1)]
+                wcs_contour.ny = header_contour['NAXIS%i' % (dimensions[1] + 1)]
+
+                # Only contour the part of the data overlapping with the image,
+                # including a margin so that the smoothing is not affected.
+                if overlap:
+                    footprint = contour_util.image_footprint(self._wcs,
+                                                             (self._wcs.ny, self._wcs.nx),
+                                                             wcs_contour,
+                                                             dimensions=[self.x, self.y],
+                                                             dimensions_target=dimensions)
+                    if footprint is None:
+                        log.warning("Could not determine the overlap between the "
+                                    "contour data and the image, so all contours "
+                                    "will be shown")
+                    else:
+                        margin = convolve_util.kernel_halo(smooth, kernel) + 1
+                        overlap_slices = contour_util.overlap_slices(footprint,
+                                                                     data_contour.shape,
+                                                                     margin=margin)
+                        if overlap_slices is None:
+                            log.warning("Contour data does not overlap with the image")
+                            return
+                        data_contour = data_contour[overlap_slices]
+                        x0, y0 = overlap_slices[1].start, overlap_slices[0].start
+
+                data_contour = _as_array(data_contour)
+            finally:
+                self._close_files()
+
+            image_contour = convolve_util.convolve(data_contour, smooth=smooth,
+                                                   kernel=kernel)
+
+            # Resample the smoothed data onto the image pixels, so that the
+            # contours do not need to be transformed
+            if reproject:
+                image_reprojected = contour_util.reproject_to_image(image_contour,
+                                                                    wcs_contour,
+                                                                    self._wcs,
+                                                                    (self._wcs.ny, self._wcs.nx),
+                                                                    dimensions=dimensions,
+                                                                    dimensions_target=[self.x, self.y],
+                                                                    slices=overlap_slices)
+                if image_reprojected is None:
+                    log.warning("The contour data can only be resampled onto "
+                                "the image pixels if both have celestial "
+                                "coordinates, so the contours will be "
+                                "transformed instead")
+                else:
+                    image_contour = image_reprojected
+                    x0, y0 = 0, 0
+                    footprint = None
+                    reprojected = True
+
         else:
-            data_contour = self._data
+
+            image_contour = self._get_smoothed_data(smooth, kernel)
             header_contour = self._header
             wcs_contour = self._wcs
 
-        wcs_contour.nx = header_contour['NAXIS%i' % (dimensions[0] + 1)]
-        wcs_contour.ny = header_contour['NAXIS%i' % (dimensions[1] + 1)]
+            wcs_contour.nx = header_contour['NAXIS%i' % (dimensions[0] + 1)]
+            wcs_contour.ny = header_contour['NAXIS%i' % (dimensions[1] + 1)]
+
+        x_contour = np.arange(image_contour.shape[1]) + x0
+        y_contour = np.arange(image_contour.shape[0]) + y0
 
-        image_contour = convolve_util.convolve(data_contour, smooth=smooth, kernel=kernel)
         if type(levels) is int:
-            interval = AsymmetricPercentileInterval(0.25, 99.75, n_samples=10000)
-            try:
-                vmin_auto, vmax_auto = interval.get_limits(image_contour)
-            except IndexError:  # no valid values
-                vmin_auto = vmax_auto = 0
+            vmin_auto, vmax_auto = interval_util.percentile_limits(image_contour,
+                                                                   0.25, 99.75)
             levels = np.linspace(vmin_auto, vmax_auto, levels)
 
-        if wcs_contour.wcs.ctype[self.x] == 'PIXEL' or wcs_contour.wcs.ctype[self.y] == 'PIXEL':
+        if (reprojected or wcs_contour.wcs.ctype[self.x] == 'PIXEL' or
+                wcs_contour.wcs.ctype[self.y] == 'PIXEL'):
             frame = 'pixel'
         else:
             frame = wcs_contour
 
-        if filled:
-            c = self.ax.contourf(image_contour, levels,
-                                 transform=self.ax.get_transform(frame),
-                                 cmap=cmap,
-                                 colors=colors, **kwargs)
+        transform = self.ax.get_transform(frame) - self.ax.transData
+
+        # The contours are computed in tiles in parallel by a layer which
+        # keeps the contours for each level, unless options specific to the
+        # Matplotlib contouring algorithms are given. In both cases the
+        # contours are computed in the pixel coordinates of the contour data,
+        # and transformed in one go (as done by WCSAxes) once any contours
+        # outside the image have been dropped.
+        if (any(key in kwargs for key in QUAD_CONTOUR_KWARGS) or
+                (filled and 'extend' in kwargs)):
+            contour = self.ax.contourf if filled else self.ax.contour
+            c = contour(x_contour, y_contour, image_contour, levels,
+                        cmap=cmap, colors=colors, **kwargs)
+            if footprint is not None:
+                c.set_paths(contour_util.drop_paths(c.get_paths(), footprint,
+                                                    filled=filled))
+            transform_contour_set_inplace(c, transform)
+            if simplify is not None or min_area is not None:
+                log.warning("simplify= and min_area= are not supported with "
+                            "Matplotlib contouring options, and are ignored")
         else:
-            c = self.ax.contour(image_contour, levels,
-                                transform=self.ax.get_transform(frame),
-                                cmap=cmap,
-                                colors=colors, **kwargs)
+            c = ContourLayer(self.ax, image_contour, levels, transform,
+                             offset=(x0, y0), footprint=footprint,
+                             filled=filled, simplify=simplify,
+                             min_area=min_area, cmap=cmap, colors=colors,
+                             **kwargs)
 
         if layer:
             contour_set_name = layer
@@ -985,7 +1653,8 @@ class FITSFigure(Layers, Regions):
                  astropy.io.fits.PrimaryHDU
                  astropy.io.fits.ImageHDU
                  astropy.wcs.WCS
-                 np.ndarray
+                 astropy.nddata.NDData (e.g. CCDData)
+                 np.ndarray, or any array-like object
 
         adata : see below
 
@@ -995,7 +1664,8 @@ class FITSFigure(Layers, Regions):
                  astropy.io.fits.PrimaryHDU
                  astropy.io.fits.ImageHDU
                  astropy.wcs.WCS
-                 np.ndarray
+                 astropy.nddata.NDData (e.g. CCDData)
+                 np.ndarray, or any array-like object
 
         phdu : int, optional
             By default, the image in the primary HDU is read in. If a
@@ -1066,12 +1736,22 @@ class FITSFigure(Layers, Regions):
         if layer:
             self.remove_layer(layer, raise_exception=False)
 
-        data_p, header_p, wcs_p, slices_p = \
-            self._get_hdu(pdata, phdu, False, convention=convention,
-                          dimensions=dimensions, slices=slices)
-        data_a, header_a, wcs_a, slices_a = \
-            self._get_hdu(adata, ahdu, False, convention=convention,
-                          dimensions=dimensions, slices=slices)
+        # The files are only needed until the data has been read in, and are
+        # closed even if an error occurs
+        try:
+            data_p, header_p, wcs_p, slices_p = \
+                self._get_hdu(pdata, phdu, False, convention=convention,
+                              dimensions=dimensions, slices=slices,
+                              lazy=self._lazy)
+            data_a, header_a, wcs_a, slices_a = \
+                self._get_hdu(adata, ahdu, False, convention=convention,
+                              dimensions=dimensions, slices=slices,
+                              lazy=self._lazy)
+
+            data_p = _as_array(data_p)
+            data_a = _as_array(data_a)
+        finally:
+            self._close_files()
 
         # TODO: use slices correctly
 
@@ -1087,20 +1767,29 @@ class FITSFigure(Layers, Regions):
         if units == 'degrees':
             angle = np.radians(angle)
 
-        linelist = []
-        for y in range(0, wcs_p.ny, step):
-            for x in range(0, wcs_p.nx, step):
-                if data_p[y, x] > cutoff and np.isfinite(angle[y, x]):
-                    r = data_p[y, x] * 0.5 * scale
-                    a = angle[y, x]
-                    x1 = x + r * np.sin(a)
-                    y1 = y - r * np.cos(a)
-                    x2 = x - r * np.sin(a)
-                    y2 = y + r * np.cos(a)
-
-                    x_world, y_world = self.pixel2world([x1, x2], [y1, y2], wcs=wcs_p)
-                    line = np.array([x_world, y_world])
-                    linelist.append(line)
+        y, x = np.mgrid[0:wcs_p.ny:step, 0:wcs_p.nx:step]
+        data_p = data_p[::step, ::step]
+        angle = angle[::step, ::step]
+
+        keep = (data_p > cutoff) & np.isfinite(angle)
+        x, y, r, a = x[keep], y[keep], data_p[keep] * 0.5 * scale, angle[keep]
+
+        dx, dy = r * np.sin(a), r * np.cos(a)
+
+        # Transform the end points of all vectors to the pixel coordinates of
+        # the image in one go, since drawing lines defined in world
+        # coordinates requires transforming each line separately. The
+        # transformation from world to pixel coordinates goes through the
+        # axes, which takes into account the slices of the image.
+        x_world, y_world = self.pixel2world(np.hstack([x + dx, x - dx]),
+                                            np.hstack([y - dy, y + dy]),
+                                            wcs=wcs_p)
+        world_to_pixel = self.ax.get_transform('world') - self.ax.transData
+        pixel = world_to_pixel.transform(np.column_stack([x_world, y_world]))
+
+        # Lines with shape (n_vectors, 2, 2), where the second dimension is
+        # x/y and the last dimension is the end points
+        linelist = pixel.reshape((2, -1, 2)).transpose(1, 2, 0)
 
         if layer:
             vector_set_name = layer
@@ -1109,7 +1798,8 @@ class FITSFigure(Layers, Regions):
             vector_set_name = 'vector_set_' + str(self._vector_counter)
 
         # Use show_lines to finish the process off
-        self.show_lines(linelist, layer=vector_set_name, **kwargs)
+        self.show_lines(linelist, layer=vector_set_name, coords_frame='pixel',
+                        **kwargs)
 
     # This method plots markers. The input should be an Nx2 array with WCS
     # coordinates in degree format.
@@ -1436,22 +2126,29 @@ class FITSFigure(Layers, Regions):
         self._layers[rectangle_set_name] = c
 
     @auto_refresh
-    def show_lines(self, line_list, layer=False, zorder=None, **kwargs):
+    def show_lines(self, line_list, layer=False, zorder=None,
+                   coords_frame='world', **kwargs):
         """
         Overlay lines on the current plot.
 
         Parameters
         ----------
 
-        line_list : list
+        line_list : list or `~numpy.ndarray`
              A list of one or more 2xN numpy arrays which contain
-             the [x, y] positions of the vertices in world coordinates.
+             the [x, y] positions of the vertices in world coordinates,
+             or an array with shape (n_lines, 2, N) if all the lines have
+             the same number of vertices.
 
         layer : str, optional
             The name of the line(s) layer. This is useful for giving
             custom names to layers (instead of line_set_n) and for
             replacing existing layers.
 
+        coords_frame : 'pixel' or 'world'
+            The reference frame in which the coordinates are defined. This is
+            used to interpret the values in ``line_list``.
+
         kwargs
             Additional keyword arguments (such as color, offsets, linestyle,
             or linewidth) are passed to Matplotlib
@@ -1459,19 +2156,24 @@ class FITSFigure(Layers, Regions):
             control the appearance of the lines.
         """
 
+        if coords_frame not in ['pixel', 'world']:
+            raise ValueError("coords_frame should be set to 'pixel' or 'world'")
+
         if 'color' not in kwargs:
             kwargs.setdefault('color', 'none')
 
         if layer:
             self.remove_layer(layer, raise_exception=False)
 
-        lines = []
-
-        for line in line_list:
-            xw, yw = line[0, :], line[1, :]
-            lines.append(np.column_stack((xw, yw)))
+        if isinstance(line_list, np.ndarray) and line_list.ndim == 3:
+            lines = line_list.transpose(0, 2, 1)
+        else:
+            lines = []
+            for line in line_list:
+                xw, yw = line[0, :], line[1, :]
+                lines.append(np.column_stack((xw, yw)))
 
-        lc = LineCollection(lines, transform=self.ax.get_transform('world'), **kwargs)
+        lc = LineCollection(lines, transform=self.ax.get_transform(coords_frame), **kwargs)
         if zorder is not None:
             lc.zorder = zorder
         c = self.ax.add_collection(lc)
@@ -2085,11 +2787,46 @@ class FITSFigure(Layers, Regions):
         self.colorbar._remove()
         del self.colorbar
 
+    def _close_files(self):
+        """
+        Close any files opened when reading in data.
+        """
+        for hdulist in self._hdulists:
+            hdulist.close()
+        self._hdulists = []
+
     def close(self):
         """
         Close the figure and free up the memory.
+
+        This also closes any files that are still open, and releases the
+        references to the data, the image and the layers, which may be
+        memory-mapped from files. The FITSFigure instance cannot be used
+        after this.
+
+        FITSFigure can also be used as a context manager, in which case this
+        is called when exiting the ``with`` block.
         """
         plt.close(self._figure)
+        self._close_files()
+        self._data = None
+        # Layers can keep references to the data (e.g. contour layers)
+        for layer in self._layers.values():
+            layer.remove()
+        self._layers.clear()
+        self._histograms = {}
+        self._auto_limits = {}
+        self._smoothed.clear()
+        self._pyramid = None
+        if self.image is not None:
+            self.image.remove()
+            self.image = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
     def savefig(self, *args, **kwargs):
         return self.save(*args, **kwargs)
@@ -0,0 +1,93 @@
+import warnings
+
+import numpy as np
+
+# Approximate maximum number of bytes of input data to read at a time
+CHUNK_SIZE = 64 * 1024 ** 2
+
+FUNCTIONS = {'mean': np.mean,
+             'nanmean': np.nanmean,
+             'median': np.median,
+             'nanmedian': np.nanmedian,
+             'max': np.max,
+             'nanmax': np.nanmax,
+             'sum': np.sum,
+             'nansum': np.nansum}
+
+
+def parse_factor(factor):
+    """
+    Return the downsampling factor as a (factor_x, factor_y) tuple.
+    """
+
+    if np.isscalar(factor):
+        factor = (factor, factor)
+    elif len(factor) != 2:
+        raise ValueError("downsample= should be an integer or a tuple of two "
+                         "integers")
+
+    factor_x, factor_y = int(factor[0]), int(factor[1])
+
+    if factor_x < 1 or factor_y < 1:
+        raise ValueError("downsample= factors should be strictly positive")
+
+    return factor_x, factor_y
+
+
+def downsample(data, factor, func='nanmean', chunk_size=CHUNK_SIZE):
+    """
+    Downsample a two-dimensional array by combining blocks of pixels.
+
+    The input is processed one band of rows at a time, so that only a bounded
+    amount of memory is needed in addition to the output. This means that the
+    input can be a memory-mapped array, an HDU section, or any other
+    array-like object supporting slicing, without being read in fully.
+
+    Parameters
+    ----------
+    data : array-like
+        The two-dimensional data to downsample. If the dimensions are not
+        multiples of the downsampling factors, the last rows and columns are
+        discarded.
+    factor : int or tuple
+        The downsampling factor, or a tuple giving the factors along x and y.
+    func : str, optional
+        The function used to combine pixels. This should be one of 'mean',
+        'nanmean', 'median', 'nanmedian', 'max', 'nanmax', 'sum', or 'nansum'.
+    chunk_size : int, optional
+        The approximate maximum number of bytes of input data to read at a
+        time.
+    """
+
+    factor_x, factor_y = parse_factor(factor)
+
+    if func not in FUNCTIONS:
+        raise ValueError("Unknown downsampling function: {0}".format(func))
+
+    function = FUNCTIONS[func]
+
+    ny, nx = data.shape
+    ny_out, nx_out = ny // factor_y, nx // factor_x
+
+    # Determine how many output rows to compute at a time
+    itemsize = max(np.dtype(getattr(data, 'dtype', float)).itemsize, 8)
+    row_size = max(nx_out * factor_x * factor_y * itemsize, 1)
+    n_rows = max(chunk_size // row_size, 1)
+
+    result = np.empty((ny_out, nx_out), dtype=float)
+
+    for j_start in range(0, ny_out, n_rows):
+
+        j_end = min(j_start + n_rows, ny_out)
+
+        band = np.asarray(data[j_start * factor_y:j_end * factor_y,
+                               0:nx_out * factor_x], dtype=float)
+        band = band.reshape((j_end - j_start, factor_y, nx_out, factor_x))
+
+        # Blocks containing only NaN values result in warnings for the NaN
+        # functions, but we just want NaN values in the output in this case.
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            result[j_start:j_end] = function(band, axis=(1, 3))
+
+    return result
@@ -10,6 +10,27 @@ convention='calabretta' when initializing the FITSFigure instance.
 """.strip()
 
 
+def has_data(header):
+    """
+    Determine from the header alone whether an HDU contains image data.
+    """
+
+    # Compressed images stored as binary tables describe the image dimensions
+    # using the ZNAXIS keywords
+    if header.get('ZIMAGE', False):
+        prefix = 'ZNAXIS'
+    else:
+        prefix = 'NAXIS'
+
+    naxis = header.get(prefix, 0)
+
+    if naxis == 0:
+        return False
+
+    return all(header.get('%s%i' % (prefix, i), 0) > 0
+               for i in range(1, naxis + 1))
+
+
 def check(header, convention=None, dimensions=[0, 1]):
 
     ix = dimensions[0] + 1
@@ -0,0 +1,501 @@
+import numpy as np
+from astropy.stats import sigma_clipped_stats
+from astropy.visualization import ZScaleInterval
+
+INTERVALS = ['percentile', 'zscale', 'sigclip']
+
+# Approximate number of values to use when sampling the data
+N_SAMPLES = 10000
+
+# Number of bins used for histograms
+N_BINS = 65536
+
+# Approximate maximum number of bytes of input data to read at a time
+CHUNK_SIZE = 64 * 1024 ** 2
+
+# Maximum number of values in a histogram bin to extract from the data when
+# determining percentiles exactly. Bins with more values are first split up
+# using a histogram of the values in the bin.
+MAX_EXACT = 2 ** 20
+
+
+def validate_interval(interval):
+    """
+    Check that the name of an interval is valid.
+    """
+    if interval not in INTERVALS:
+        raise ValueError("interval= should be one of {0}".format(
+                         ", ".join(repr(name) for name in INTERVALS)))
+
+
+def sample(data, n_samples=N_SAMPLES):
+    """
+    Return the finite values of a regularly strided subset of the data with
+    at least roughly ``n_samples`` elements.
+
+    Unlike random sampling, this always gives the same result for the same
+    data, and does not require the finite values of the full array to be
+    extracted first.
+    """
+
+    data = np.asarray(data)
+
+    if data.size > n_samples:
+        step = max(int((data.size / n_samples) ** (1. / data.ndim)), 1)
+        subset = data[(slice(None, None, step),) * data.ndim]
+        values = subset[np.isfinite(subset)]
+        if values.size > 0:
+            return values
+
+    return data[np.isfinite(data)]
+
+
+class Histogram(object):
+    """
+    A histogram that can be built up incrementally from chunks of data, with
+    a range that is extended as needed.
+
+    The bin width is always a power of two, and the bin edges are multiples
+    of the bin width, so that when the range needs to be extended, existing
+    bins can be merged exactly into wider bins.
+
+    Percentiles are only approximate (see :meth:`percentile`), but the
+    histogram can be used to find the exact percentiles of the data by only
+    extracting the values in a few bins (see :func:`percentile_limits`).
+
+    Parameters
+    ----------
+    n_bins : int, optional
+        The number of bins.
+    """
+
+    def __init__(self, n_bins=N_BINS):
+        self.n_bins = n_bins
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+        self.total = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._lo = None
+        self._width = None
+
+    @property
+    def error(self):
+        """
+        The bin width, which is the resolution of the percentiles returned
+        by :meth:`percentile` if the values are densely distributed.
+        """
+        return 0. if self._width is None else self._width
+
+    def bin_index(self, values):
+        """
+        Return the index of the bin containing each value.
+        """
+        index = ((values - self._lo) / self._width).astype(np.intp)
+        np.clip(index, 0, self.n_bins - 1, out=index)
+        return index
+
+    def update(self, values):
+        """
+        Add values to the histogram. Non-finite values are ignored.
+        """
+
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[np.isfinite(values)]
+
+        if values.size == 0:
+            return
+
+        vmin, vmax = values.min(), values.max()
+
+        self._extend(vmin, vmax)
+
+        self.counts += np.bincount(self.bin_index(values), minlength=self.n_bins)
+
+        self.total += values.size
+        self.min = min(self.min, vmin)
+        self.max = max(self.max, vmax)
+
+    def _extend(self, vmin, vmax):
+
+        if self._lo is None:
+            width = (vmax - vmin) / self.n_bins
+            if width == 0:
+                width = max(np.spacing(abs(vmin)), np.finfo(float).tiny)
+            width = 2. ** np.ceil(np.log2(width))
+        elif vmin >= self._lo and vmax < self._lo + self.n_bins * self._width:
+            return
+        else:
+            vmin = min(vmin, self._lo)
+            vmax = max(vmax, self._lo + self.n_bins * self._width)
+            width = self._width * 2
+
+        while True:
+            lo = np.floor(vmin / width) * width
+            if lo + self.n_bins * width > vmax:
+                break
+            width *= 2
+
+        # Merge existing bins into the new wider bins, using the bin centers
+        # to avoid rounding issues at the edges.
+        if self._lo is not None:
+            centers = self._lo + (np.arange(self.n_bins) + 0.5) * self._width
+            index = ((centers - lo) / width).astype(np.intp)
+            np.clip(index, 0, self.n_bins - 1, out=index)
+            counts = np.zeros(self.n_bins, dtype=np.int64)
+            np.add.at(counts, index, self.counts)
+            self.counts = counts
+
+        self._lo = lo
+        self._width = width
+
+    def percentile(self, q):
+        """
+        Return the approximate value(s) at the given percentile(s), which
+        should be between 0 and 100, interpolating linearly within bins.
+
+        This is only accurate to within about one bin width if many values
+        fall in each bin, and can be very inaccurate if the values are
+        concentrated in a few bins (e.g. if there are extreme outliers).
+        """
+
+        if self.total == 0:
+            raise ValueError("Histogram does not contain any values")
+
+        q = np.asarray(q, dtype=float)
+
+        cumulative = np.cumsum(self.counts)
+        # The rank is chosen so that each value is at the center of its bin
+        # to be consistent with np.percentile for widely spaced values.
+        rank = q / 100. * (self.total - 1) + 0.5
+        index = np.searchsorted(cumulative, rank, side='left')
+        np.clip(index, 0, self.n_bins - 1, out=index)
+        below = cumulative[index] - self.counts[index]
+        fraction = (rank - below) / np.maximum(self.counts[index], 1)
+        values = self._lo + (index + np.clip(fraction, 0, 1)) * self._width
+
+        values = np.where(q <= 0, self.min, values)
+        values = np.where(q >= 100, self.max, values)
+
+        return np.clip(values, self.min, self.max)
+
+
+class IntegerHistogram(object):
+    """
+    An exact histogram of raw 8- or 16-bit integer data, with one bin for
+    each possible raw value.
+
+    This has the same interface as :class:`Histogram`, but percentiles are
+    exact (and consistent with :func:`numpy.percentile`).
+
+    Parameters
+    ----------
+    counts : `~numpy.ndarray`
+        The number of occurrences of each raw value.
+    values : `~numpy.ndarray`
+        The physical value corresponding to each raw value, which can be NaN
+        for raw values that represent undefined pixels.
+    """
+
+    error = 0.
+
+    def __init__(self, counts, values):
+        keep = np.isfinite(values) & (counts > 0)
+        order = np.argsort(values[keep], kind='stable')
+        self.values = values[keep][order]
+        self.counts = counts[keep][order]
+        self.total = int(self.counts.sum())
+        self.min = self.values[0] if self.total > 0 else np.inf
+        self.max = self.values[-1] if self.total > 0 else -np.inf
+
+    def percentile(self, q):
+        """
+        Return the value(s) at the given percentile(s), which should be
+        between 0 and 100, interpolating linearly between values.
+        """
+
+        if self.total == 0:
+            raise ValueError("Histogram does not contain any values")
+
+        q = np.asarray(q, dtype=float)
+
+        cumulative = np.cumsum(self.counts)
+        rank = q / 100. * (self.total - 1)
+        lower = np.floor(rank)
+        upper = np.minimum(lower + 1, self.total - 1)
+        value_lower = self.values[np.searchsorted(cumulative, lower, side='right')]
+        value_upper = self.values[np.searchsorted(cumulative, upper, side='right')]
+
+        return value_lower + (rank - lower) * (value_upper - value_lower)
+
+
+def integer_histogram(data, scaling, chunk_size=CHUNK_SIZE):
+    """
+    Compute the exact histogram of raw 8- or 16-bit integer data in a single
+    pass, counting occurrences of each raw value with :func:`numpy.bincount`.
+
+    Parameters
+    ----------
+    data : array-like
+        The raw integer data.
+    scaling : :class:`~aplpy.lut_util.IntegerScaling`
+        The scaling from raw to physical values.
+    chunk_size : int, optional
+        The approximate maximum number of bytes of input data to read at a
+        time.
+
+    Returns
+    -------
+    histogram : :class:`IntegerHistogram`
+    """
+
+    counts = np.zeros(len(scaling.values), dtype=np.int64)
+
+    shape = np.shape(data)
+    row_size = max(int(np.prod(shape[1:])) * 8, 1)
+    n_rows = max(chunk_size // row_size, 1)
+
+    for start in range(0, shape[0], n_rows):
+        index = np.asarray(data[start:start + n_rows]).astype(np.intp).ravel()
+        index -= scaling.offset
+        counts += np.bincount(index, minlength=len(counts))
+
+    return IntegerHistogram(counts, scaling.values)
+
+
+def _chunks(data, chunk_size=CHUNK_SIZE):
+    """
+    Iterate over the finite values of the data, one chunk along the first
+    dimension at a time.
+    """
+
+    if np.ndim(data) == 0:
+        chunks = [data]
+    else:
+        shape = np.shape(data)
+        itemsize = max(np.dtype(getattr(data, 'dtype', float)).itemsize, 8)
+        row_size = max(int(np.prod(shape[1:])) * itemsize, 1)
+        n_rows = max(chunk_size // row_size, 1)
+        chunks = (data[start:start + n_rows] for start in range(0, shape[0], n_rows))
+
+    for chunk in chunks:
+        values = np.asarray(chunk, dtype=float).ravel()
+        yield values[np.isfinite(values)]
+
+
+def _select(data, bins, chunk_size=CHUNK_SIZE):
+    """
+    Iterate over the finite values of the data that fall in the given bins,
+    where ``bins`` is a sequence of ``(histogram, index)`` pairs, one chunk
+    at a time.
+    """
+    for values in _chunks(data, chunk_size=chunk_size):
+        for hist, index in bins:
+            values = values[hist.bin_index(values) == index]
+        yield values
+
+
+def _order_statistics(data, hist, ranks, bins=(), chunk_size=CHUNK_SIZE):
+    """
+    Return the values with the given ranks (starting at zero) in the sorted
+    finite values of the data that fall in ``bins`` (see :func:`_select`),
+    given the histogram ``hist`` of these values.
+    """
+
+    cumulative = np.cumsum(hist.counts)
+    index = np.searchsorted(cumulative, ranks, side='right')
+    ranks = ranks - (cumulative[index] - hist.counts[index])
+
+    result = np.zeros(len(ranks))
+
+    # Extract the values in the bins with few values in a single pass, and
+    # find the values with the requested ranks exactly.
+    small = hist.counts[index] <= MAX_EXACT
+    if np.any(small):
+        values = np.concatenate([values[np.isin(hist.bin_index(values), index[small])]
+                                 for values in _select(data, bins, chunk_size=chunk_size)])
+        values_index = hist.bin_index(values)
+        for i in np.nonzero(small)[0]:
+            values_bin = values[values_index == index[i]]
+            if values_bin.size > 0:
+                rank = min(ranks[i], values_bin.size - 1)
+                result[i] = np.partition(values_bin, rank)[rank]
+
+    # Split up bins with many values using a histogram of the values in the
+    # bin. Since the histogram covers the range of the values in the bin, at
+    # most a few levels of histograms are needed.
+    for i in np.unique(index[~small]):
+        bins_sub = tuple(bins) + ((hist, i),)
+        hist_sub = Histogram(n_bins=hist.n_bins)
+        for values in _select(data, bins_sub, chunk_size=chunk_size):
+            hist_sub.update(values)
+        in_bin = index == i
+        if hist_sub.min == hist_sub.max:
+            result[in_bin] = hist_sub.min
+        else:
+            result[in_bin] = _order_statistics(data, hist_sub, ranks[in_bin],
+                                               bins=bins_sub, chunk_size=chunk_size)
+
+    return result
+
+
+def exact_percentile(data, q, hist, chunk_size=CHUNK_SIZE):
+    """
+    Return the exact value(s) of the finite values of the data at the given
+    percentile(s), consistent with :func:`numpy.percentile`.
+
+    The histogram of the data is used to find the bins that contain the
+    required values, and only the values in these bins are extracted from
+    the data, so that the data is never read in fully.
+
+    Parameters
+    ----------
+    data : array-like
+        The data.
+    q : float or iterable
+        The percentile(s), between 0 and 100.
+    hist : :class:`Histogram`
+        The histogram of the data.
+    chunk_size : int, optional
+        The approximate maximum number of bytes of input data to read at a
+        time.
+    """
+
+    if hist.total == 0:
+        raise ValueError("Histogram does not contain any values")
+
+    q = np.asarray(q, dtype=float)
+
+    rank = np.clip(q, 0, 100).ravel() / 100. * (hist.total - 1)
+    lower = np.floor(rank).astype(np.int64)
+    upper = np.minimum(lower + 1, hist.total - 1)
+
+    values = _order_statistics(data, hist, np.hstack([lower, upper]),
+                               chunk_size=chunk_size)
+    value_lower, value_upper = values[:rank.size], values[rank.size:]
+
+    values = value_lower + (rank - lower) * (value_upper - value_lower)
+
+    return values.reshape(q.shape)
+
+
+def histogram(data, n_bins=N_BINS, chunk_size=CHUNK_SIZE):
+    """
+    Compute the histogram of the finite values in an array in a single pass.
+
+    The data is read one chunk along the first dimension at a time, so that
+    memory-mapped arrays and HDU sections are never read in fully, and at
+    most a chunk-sized temporary array is needed.
+
+    Parameters
+    ----------
+    data : array-like
+        The data, which can have any number of dimensions.
+    n_bins : int, optional
+        The number of bins.
+    chunk_size : int, optional
+        The approximate maximum number of bytes of input data to read at a
+        time.
+
+    Returns
+    -------
+    histogram : :class:`Histogram`
+    """
+
+    hist = Histogram(n_bins=n_bins)
+
+    for values in _chunks(data, chunk_size=chunk_size):
+        hist.update(values)
+
+    return hist
+
+
+def percentile_limits(data, pmin, pmax, hist=None, exact=True):
+    """
+    Determine the values at the pmin and pmax percentiles of the data.
+
+    By default, the values are exact, and consistent with
+    :func:`numpy.percentile`. The histogram of the data is computed in a
+    single pass, and the data is then read again to extract only the values
+    in the histogram bins that contain the percentiles (see
+    :func:`exact_percentile`).
+
+    Parameters
+    ----------
+    data : array-like
+        The data to determine the limits for. This can be `None` if ``hist``
+        is given and ``exact`` is `False`.
+    pmin, pmax : float
+        The percentiles (between 0 and 100) for the lower and upper limit.
+    hist : :class:`Histogram`, optional
+        A previously computed histogram of the data.
+    exact : bool, optional
+        If `False`, the limits are only estimated from the histogram (see
+        :meth:`Histogram.percentile`), so that the data is read at most once.
+        This is useful for data that cannot be read again, but the limits
+        can be inaccurate if the data has extreme outliers.
+
+    Returns
+    -------
+    vmin, vmax : float
+        The limits, or zero for both if the data has no finite values.
+    """
+
+    if hist is None:
+        if data is None:
+            raise ValueError("data and hist cannot both be None")
+        hist = histogram(data)
+
+    if hist.total == 0:
+        return 0., 0.
+
+    if isinstance(hist, IntegerHistogram) or not exact or data is None:
+        vmin, vmax = hist.percentile([pmin, pmax])
+    else:
+        vmin, vmax = exact_percentile(data, [pmin, pmax], hist)
+
+    return float(vmin), float(vmax)
+
+
+def sample_limits(data, interval, n_samples=N_SAMPLES, scaling=None):
+    """
+    Determine limits for the data using an interval that is computed on a
+    strided sample of the data (see :func:`sample`), so that the cost does
+    not depend on the size of the data.
+
+    Parameters
+    ----------
+    data : array-like
+        The data to determine the limits for.
+    interval : { 'zscale', 'sigclip' }
+        The interval to use. 'zscale' uses the IRAF zscale algorithm, and
+        'sigclip' gives the sigma-clipped median minus and plus three times
+        the sigma-clipped standard deviation.
+    n_samples : int, optional
+        The approximate number of values to use.
+    scaling : :class:`~aplpy.lut_util.IntegerScaling`, optional
+        If the data is raw integer data, the scaling to physical values.
+
+    Returns
+    -------
+    vmin, vmax : float
+        The limits, or zero for both if the data has no finite values.
+    """
+
+    values = sample(data, n_samples=n_samples)
+
+    if scaling is not None:
+        values = scaling.scale(values)
+        values = values[np.isfinite(values)]
+
+    if values.size == 0:
+        return 0., 0.
+
+    if interval == 'zscale':
+        vmin, vmax = ZScaleInterval(n_samples=values.size).get_limits(values)
+    elif interval == 'sigclip':
+        _, median, stddev = sigma_clipped_stats(values, sigma=3)
+        vmin, vmax = median - 3 * stddev, median + 3 * stddev
+    else:
+        raise ValueError("interval= should be 'zscale' or 'sigclip'")
+
+    return float(vmin), float(vmax)
@@ -4,6 +4,7 @@ from matplotlib.contour import ContourSet
 from matplotlib.collections import RegularPolyCollection, \
     PatchCollection, CircleCollection, LineCollection
 
+from .contour_layer import ContourLayer
 from .regions import ArtistCollection
 from .decorators import auto_refresh
 
@@ -14,7 +15,7 @@ class Layers(object):
         pass
 
     def _layer_type(self, layer):
-        if isinstance(self._layers[layer], ContourSet):
+        if isinstance(self._layers[layer], (ContourLayer, ContourSet)):
             return 'contour'
         elif isinstance(self._layers[layer], RegularPolyCollection):
             return 'collection'
@@ -55,12 +56,10 @@ class Layers(object):
 
         for layer in self._layers:
 
-            layer_type = self._layer_type(layer)
+            # Check that the layer type is supported
+            self._layer_type(layer)
 
-            if layer_type == 'contour':
-                visible = self._layers[layer].collections[0].get_visible()
-            elif layer_type == 'collection':
-                visible = self._layers[layer].get_visible()
+            visible = self._layers[layer].get_visible()
 
             layers_list.append({'name': layer, 'visible': visible})
 
@@ -95,8 +94,7 @@ class Layers(object):
             layer_type = self._layer_type(layer)
 
             if layer_type == 'contour':
-                for contour in self._layers[layer].collections:
-                    contour.remove()
+                self._layers[layer].remove()
                 self._layers.pop(layer)
             elif layer_type == 'collection':
                 self._layers[layer].remove()
@@ -125,13 +123,8 @@ class Layers(object):
         """
         if layer in self._layers:
 
-            layer_type = self._layer_type(layer)
-
-            if layer_type == 'contour':
-                for contour in self._layers[layer].collections:
-                    contour.set_visible(False)
-            elif layer_type == 'collection':
-                self._layers[layer].set_visible(False)
+            self._layer_type(layer)
+            self._layers[layer].set_visible(False)
 
         else:
 
@@ -152,13 +145,8 @@ class Layers(object):
         """
         if layer in self._layers:
 
-            layer_type = self._layer_type(layer)
-
-            if layer_type == 'contour':
-                for contour in self._layers[layer].collections:
-                    contour.set_visible(True)
-            elif layer_type == 'collection':
-                self._layers[layer].set_visible(True)
+            self._layer_type(layer)
+            self._layers[layer].set_visible(True)
 
         else:
             if raise_exception:
@@ -0,0 +1,252 @@
+import numpy as np
+from matplotlib.colors import Normalize
+from matplotlib.image import AxesImage
+
+__all__ = ['LUTNormalize', 'LUTCursorMixin', 'LUTImage', 'IntegerScaling',
+           'ScaledArray', 'quantize', 'make_lut']
+
+# Number of levels used to quantize the data. The last possible value of a
+# 16-bit index is reserved for NaN values.
+N_LEVELS = 65535
+BAD_INDEX = N_LEVELS
+
+# Approximate maximum number of bytes of input data to read at a time
+CHUNK_SIZE = 64 * 1024 ** 2
+
+
+def quantize(data, vmin, vmax, n_levels=N_LEVELS, chunk_size=CHUNK_SIZE):
+    """
+    Quantize data into 16-bit indices of evenly spaced levels between vmin
+    and vmax.
+
+    Values below vmin or above vmax are assigned the first or last level
+    respectively, and NaN values are assigned ``BAD_INDEX``. The data is
+    processed one band of rows at a time, so that only a bounded amount of
+    memory is needed in addition to the output.
+
+    Parameters
+    ----------
+    data : array-like
+        The two-dimensional data to quantize.
+    vmin, vmax : float
+        The values corresponding to the first and last level.
+    n_levels : int, optional
+        The number of levels.
+    chunk_size : int, optional
+        The approximate maximum number of bytes of input data to read at a
+        time.
+    """
+
+    if vmax > vmin:
+        scale = (n_levels - 1) / (vmax - vmin)
+    else:
+        scale = 0.
+
+    ny, nx = data.shape
+    n_rows = max(chunk_size // max(nx * 8, 1), 1)
+
+    result = np.empty((ny, nx), dtype=np.uint16)
+
+    for start in range(0, ny, n_rows):
+        band = np.array(data[start:start + n_rows], dtype=float)
+        bad = np.isnan(band)
+        np.clip(band, vmin, vmax, out=band)
+        band -= vmin
+        band *= scale
+        np.rint(band, out=band)
+        band[bad] = BAD_INDEX
+        result[start:start + n_rows] = band
+
+    return result
+
+
+def make_lut(normalizer, n_levels=N_LEVELS):
+    """
+    Evaluate a normalizer for each of the levels used by :func:`quantize`.
+
+    The returned table has one extra element set to NaN, for ``BAD_INDEX``.
+    """
+    values = np.linspace(normalizer.vmin, normalizer.vmax, n_levels)
+    lut = np.ma.filled(normalizer(values).astype(float), np.nan)
+    return np.append(lut, np.nan)
+
+
+class IntegerScaling(object):
+    """
+    The physical values corresponding to all possible values of raw 8- or
+    16-bit integer data, given the BSCALE, BZERO, and BLANK FITS keywords.
+
+    Parameters
+    ----------
+    dtype : `~numpy.dtype`
+        The type of the raw data.
+    bscale, bzero : float, optional
+        The physical values are given by ``raw * bscale + bzero``.
+    blank : int, optional
+        The raw value used for undefined pixels, which is mapped to NaN.
+    """
+
+    def __init__(self, dtype, bscale=1., bzero=0., blank=None):
+        info = np.iinfo(dtype)
+        if info.bits > 16:
+            raise ValueError("Only 8- and 16-bit integer data can be scaled "
+                             "using a lookup table")
+        self.bscale = float(bscale)
+        self.bzero = float(bzero)
+        self.offset = int(info.min)
+        self.values = np.arange(info.min, info.max + 1) * float(bscale) + float(bzero)
+        if blank is not None and info.min <= blank <= info.max:
+            self.values[int(blank) - self.offset] = np.nan
+
+    @classmethod
+    def from_header(cls, header):
+        """
+        Create the scaling for the raw data of an HDU from its header.
+        """
+        if header['BITPIX'] == 8:
+            dtype = np.uint8
+        elif header['BITPIX'] == 16:
+            dtype = np.int16
+        else:
+            raise ValueError("Only 8- and 16-bit integer data can be scaled "
+                             "using a lookup table")
+        return cls(dtype, bscale=header.get('BSCALE', 1.),
+                   bzero=header.get('BZERO', 0.), blank=header.get('BLANK'))
+
+    def scale(self, data):
+        """
+        Return the physical values for raw data.
+        """
+        return self.values[np.asarray(data).astype(np.intp) - self.offset]
+
+
+class ScaledArray(object):
+    """
+    A wrapper around raw integer data which returns the physical values
+    whenever it is sliced, so that code reading the data one part at a time
+    (such as :func:`~aplpy.downsample_util.downsample`) never needs a
+    floating-point copy of the whole array.
+    """
+
+    def __init__(self, data, scaling):
+        self._data = data
+        self._scaling = scaling
+        self.shape = data.shape
+        self.dtype = np.dtype(float)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __getitem__(self, item):
+        return self._scaling.scale(self._data[item])
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self._scaling.scale(self._data), dtype=dtype)
+
+
+class LUTNormalize(Normalize):
+    """
+    Normalize indices of quantized data (see :func:`quantize`) or raw integer
+    data (see :class:`IntegerScaling`) by looking up the normalized value of
+    each possible index in a table, so that the cost does not depend on how
+    expensive the stretch is.
+
+    Parameters
+    ----------
+    normalizer : `~matplotlib.colors.Normalize`
+        The normalizer for the original data, which is used to build the
+        lookup table, and which should be used to show the data values, for
+        instance in colorbars.
+    n_levels : int, optional
+        The number of levels the data was quantized into.
+    scaling : :class:`IntegerScaling`, optional
+        If specified, the data is raw integer data, and the lookup table
+        combines the scaling to physical values with the normalization.
+    """
+
+    def __init__(self, normalizer, n_levels=N_LEVELS, scaling=None):
+        if scaling is None:
+            lut = make_lut(normalizer, n_levels=n_levels)
+            offset = 0
+            # The data values are given by vmin + index * step
+            self._zero = float(normalizer.vmin)
+            self._step = (normalizer.vmax - normalizer.vmin) / (n_levels - 1)
+            values = np.append(np.linspace(normalizer.vmin, normalizer.vmax,
+                                           n_levels), np.nan)
+        else:
+            lut = np.ma.filled(normalizer(scaling.values).astype(float), np.nan)
+            offset = scaling.offset
+            self._zero = scaling.bzero
+            self._step = scaling.bscale
+            values = scaling.values
+        super().__init__(vmin=offset, vmax=offset + len(lut) - 1, clip=False)
+        self.data_norm = normalizer
+        self.lut = lut
+        self._values = values
+        self._offset = offset
+
+    @property
+    def resolution(self):
+        """
+        The difference between the data values of consecutive indices.
+        """
+        return abs(self._step)
+
+    def _index(self, value):
+        index = np.rint(np.ma.filled(np.atleast_1d(value), self._offset)).astype(np.intp)
+        index -= self._offset
+        np.clip(index, 0, len(self.lut) - 1, out=index)
+        return index
+
+    def __call__(self, value, clip=None):
+        mask = np.ma.getmaskarray(np.atleast_1d(value))
+        result = np.ma.array(self.lut[self._index(value)], mask=mask)
+        if np.ndim(value) == 0:
+            return result[0]
+        return result
+
+    def data_values(self, value):
+        """
+        Return the data values corresponding to indices (or raw values),
+        which are NaN for undefined values.
+        """
+        result = self._values[self._index(value)]
+        if np.ndim(value) == 0:
+            return result[0]
+        return result
+
+    def inverse(self, value):
+        data = np.asarray(self.data_norm.inverse(value), dtype=float)
+        if self._step == 0:
+            return np.zeros_like(data) + self._offset
+        return (data - self._zero) / self._step
+
+
+class LUTCursorMixin(object):
+    """
+    A mixin for images which, if the image uses a :class:`LUTNormalize`,
+    shows the data values rather than the indices under the cursor.
+    """
+
+    def format_cursor_data(self, data):
+        if not isinstance(self.norm, LUTNormalize) or np.ndim(data) != 0:
+            return super().format_cursor_data(data)
+        if data is None or np.ma.is_masked(data):
+            return "[]"
+        value = self.norm.data_values(data)
+        # Show enough significant digits to distinguish consecutive levels
+        delta = self.norm.resolution
+        if np.isfinite(value) and value != 0 and delta > 0:
+            digits = int(np.floor(np.log10(abs(value))) - np.floor(np.log10(delta))) + 1
+            digits = min(max(digits, 1), 17)
+        else:
+            digits = 3
+        return "[{0:-#.{1}g}]".format(value, digits)
+
+
+class LUTImage(LUTCursorMixin, AxesImage):
+    """
+    An image of quantized or raw integer data shown through a
+    :class:`LUTNormalize`.
+    """
@@ -0,0 +1,40 @@
+from matplotlib.image import AxesImage
+
+from .lut_util import LUTCursorMixin
+
+__all__ = ['PrerenderedImage']
+
+
+class PrerenderedImage(LUTCursorMixin, AxesImage):
+    """
+    An image that converts its data to 8-bit RGBA values once, using the
+    current normalization and colormap, and then only resamples the RGBA
+    values every time it is drawn.
+
+    The RGBA values are computed again only after the data, normalization,
+    or colormap have been changed, so that repeated drawing and saving does
+    not normalize and colormap every pixel again.
+    """
+
+    def __init__(self, ax, **kwargs):
+        self._rgba = None
+        super().__init__(ax, **kwargs)
+
+    def set_data(self, A):
+        super().set_data(A)
+        self._rgba = None
+
+    def changed(self):
+        self._rgba = None
+        super().changed()
+
+    def make_image(self, renderer, magnification=1.0, unsampled=False):
+        if self._rgba is None:
+            self._rgba = self.to_rgba(self._A, bytes=True)
+        # Temporarily swap in the RGBA values, which are then only resampled
+        data, self._A = self._A, self._rgba
+        try:
+            return super().make_image(renderer, magnification=magnification,
+                                      unsampled=unsampled)
+        finally:
+            self._A = data
@@ -0,0 +1,186 @@
+import os
+import hashlib
+
+import numpy as np
+from astropy.io import fits
+from matplotlib.image import AxesImage
+
+from . import downsample_util
+
+__all__ = ['ImagePyramid', 'PyramidImage']
+
+# Approximate maximum number of bytes of data to read at a time when
+# computing the fingerprint of the data
+CHUNK_SIZE = 64 * 1024 ** 2
+
+
+def fingerprint(data, chunk_size=CHUNK_SIZE):
+    """
+    Compute a fingerprint for an array from its shape, type, and all of its
+    values, which is used to check whether a pyramid saved to disk matches
+    the data. The data is read one band of rows at a time.
+    """
+    data = np.asanyarray(data)
+    md5 = hashlib.md5(str((data.shape, data.dtype.str)).encode('ascii'))
+    row_size = max(int(np.prod(data.shape[1:])) * data.dtype.itemsize, 1)
+    n_rows = max(chunk_size // row_size, 1)
+    for start in range(0, data.shape[0], n_rows):
+        md5.update(np.ascontiguousarray(data[start:start + n_rows]).tobytes())
+    return md5.hexdigest()
+
+
+class ImagePyramid(object):
+    """
+    A set of successively downsampled versions of an image.
+
+    Level 0 is the original image, and each subsequent level is downsampled
+    by a factor of two compared to the previous one. Dimensions that are
+    not a multiple of two are padded with NaN values before downsampling, so
+    that each level covers the whole image.
+
+    The levels are computed once, so they are not updated if the image is
+    modified in place afterwards.
+
+    Parameters
+    ----------
+    data : `~numpy.ndarray`
+        The two-dimensional image.
+    min_size : int, optional
+        Levels are added until both dimensions are at most this size.
+    func : str, optional
+        The function used to combine pixels (see
+        :func:`~aplpy.downsample_util.downsample`).
+    """
+
+    def __init__(self, data, min_size=256, func='nanmean', levels=None):
+
+        self.data = data
+        self.func = func
+
+        if levels is None:
+            levels = []
+            current = data
+            while max(current.shape) > min_size:
+                ny, nx = current.shape
+                if ny % 2 == 1 or nx % 2 == 1:
+                    current = np.pad(np.asarray(current, dtype=float),
+                                     ((0, ny % 2), (0, nx % 2)),
+                                     constant_values=np.nan)
+                current = downsample_util.downsample(current, 2, func=func)
+                levels.append(current.astype(np.float32))
+
+        self._levels = [data] + list(levels)
+
+    @property
+    def n_levels(self):
+        return len(self._levels)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    def get_level(self, level):
+        """
+        Return the data for a given level, as well as the size of the area
+        it covers along x and y relative to the original image (this can be
+        slightly larger than one because of padding).
+        """
+        data = self._levels[level]
+        factor = 2 ** level
+        ny, nx = data.shape
+        return data, (nx * factor / self.shape[1], ny * factor / self.shape[0])
+
+    def select_level(self, density):
+        """
+        Find the coarsest level which still has at least as many pixels as
+        the output device for a given density, in original image pixels per
+        output pixel.
+        """
+        if not np.isfinite(density) or density < 2:
+            return 0
+        return int(min(np.floor(np.log2(density)), self.n_levels - 1))
+
+    def write(self, filename, overwrite=False):
+        """
+        Write all downsampled levels to a FITS file.
+        """
+        primary = fits.PrimaryHDU()
+        primary.header['APLFUNC'] = self.func
+        primary.header['APLHASH'] = fingerprint(self.data)
+        hdus = [primary] + [fits.ImageHDU(level) for level in self._levels[1:]]
+        fits.HDUList(hdus).writeto(filename, overwrite=overwrite)
+
+    @classmethod
+    def read(cls, filename, data):
+        """
+        Read the downsampled levels for ``data`` from a FITS file previously
+        written with :meth:`write`. The levels are memory-mapped rather than
+        read into memory. Returns `None` if the file does not match the data.
+        """
+        # The memory-mapped levels remain valid once the file is closed
+        with fits.open(filename) as hdulist:
+            if hdulist[0].header.get('APLHASH') != fingerprint(data):
+                return None
+            levels = [hdu.data for hdu in hdulist[1:]]
+            func = hdulist[0].header['APLFUNC']
+        return cls(data, func=func, levels=levels)
+
+    @classmethod
+    def from_file(cls, filename, data, **kwargs):
+        """
+        Read the pyramid from ``filename`` if it exists and matches the data,
+        otherwise compute it and save it to ``filename``.
+        """
+        if os.path.exists(filename):
+            pyramid = cls.read(filename, data)
+            if pyramid is not None:
+                return pyramid
+        pyramid = cls(data, **kwargs)
+        pyramid.write(filename, overwrite=True)
+        return pyramid
+
+
+class PyramidImage(AxesImage):
+    """
+    An image that, every time it is drawn, shows the coarsest level of an
+    :class:`ImagePyramid` that still has at least the resolution of the
+    output for the current view, so that the drawing time does not depend
+    on the size of the full-resolution image.
+    """
+
+    def __init__(self, ax, pyramid, extent, **kwargs):
+        super().__init__(ax, **kwargs)
+        self._level = None
+        self.set_pyramid(pyramid, extent)
+
+    def set_pyramid(self, pyramid, extent):
+        """
+        Set the pyramid to show, as well as the extent of the full image.
+        """
+        self._pyramid = pyramid
+        self._full_extent = extent
+        self._set_level(0)
+
+    def _set_level(self, level):
+        data, (scale_x, scale_y) = self._pyramid.get_level(level)
+        x_min, x_max, y_min, y_max = self._full_extent
+        self.set_data(data)
+        self.set_extent((x_min, x_min + (x_max - x_min) * scale_x,
+                         y_min, y_min + (y_max - y_min) * scale_y))
+        self._level = level
+
+    def draw(self, renderer):
+        x_min, x_max, y_min, y_max = self._full_extent
+        ny, nx = self._pyramid.shape
+        view_x_min, view_x_max = self.axes.get_xlim()
+        view_y_min, view_y_max = self.axes.get_ylim()
+        bbox = self.axes.bbox
+        if bbox.width > 0 and bbox.height > 0:
+            density_x = (abs(view_x_max - view_x_min) * nx /
+                         abs(x_max - x_min) / bbox.width)
+            density_y = (abs(view_y_max - view_y_min) * ny /
+                         abs(y_max - y_min) / bbox.height)
+            level = self._pyramid.select_level(min(density_x, density_y))
+            if level != self._level:
+                self._set_level(level)
+        super().draw(renderer)
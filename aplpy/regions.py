@@ -59,7 +59,9 @@ class Regions(object):
             ds9 call and onto the patchcollections.
         """
 
-        PC, TC = ds9(region_file, flatten_header(self._header), **kwargs)
+        PC, TC = ds9(region_file,
+                     flatten_header(self._header, orig_wcs=self._wcs),
+                     **kwargs)
 
         PC.add_to_axes(self.ax)
         TC.add_to_axes(self.ax)
@@ -173,13 +175,17 @@ class ArtistCollection():
             T.set_zorder(zorder)
 
 
-def flatten_header(header):
+def flatten_header(header, orig_wcs=None):
     """
     Attempt to turn an N-dimensional fits header into a 2-dimensional header
     Turns all CRPIX[>2] etc. into new keywords with suffix 'A'
+
+    If the WCS for the header has already been parsed, it can be passed as
+    orig_wcs to avoid parsing it again.
     """
 
-    orig_wcs = wcs.WCS(header)
+    if orig_wcs is None:
+        orig_wcs = wcs.WCS(header)
     newheader = orig_wcs.celestial.to_header()
     newheader['NAXIS'] = 2
     newheader['NAXIS1'] = header['NAXIS{0}'.format(orig_wcs.wcs.lng + 1)]
@@ -5,21 +5,25 @@ import numpy as np
 from astropy import log
 from astropy.io import fits
 from astropy.coordinates import ICRS
-from astropy.visualization import AsymmetricPercentileInterval, simple_norm
+from astropy.visualization import simple_norm
 
 from reproject import reproject_interp
 from reproject.mosaicking import find_optimal_celestial_wcs
 
+from . import interval_util
+
 
 def _data_stretch(image, vmin=None, vmax=None, pmin=0.25, pmax=99.75,
-                  stretch='linear', vmid=None, exponent=2):
+                  stretch='linear', vmid=None, exponent=2,
+                  interval='percentile'):
+
+    interval_util.validate_interval(interval)
 
     if vmin is None or vmax is None:
-        interval = AsymmetricPercentileInterval(pmin, pmax, n_samples=10000)
-        try:
-            vmin_auto, vmax_auto = interval.get_limits(image)
-        except IndexError:  # no valid values
-            vmin_auto = vmax_auto = 0
+        if interval == 'percentile':
+            vmin_auto, vmax_auto = interval_util.percentile_limits(image, pmin, pmax)
+        else:
+            vmin_auto, vmax_auto = interval_util.sample_limits(image, interval)
 
     if vmin is None:
         log.info("vmin = %10.3e (auto)" % vmin_auto)
@@ -52,7 +56,9 @@ def make_rgb_image(data, output, indices=(0, 1, 2), vmin_r=None, vmax_r=None,
                    pmax_g=99.75, stretch_g='linear', vmid_g=None, exponent_g=2,
                    vmin_b=None, vmax_b=None, pmin_b=0.25, pmax_b=99.75,
                    stretch_b='linear', vmid_b=None, exponent_b=2,
-                   make_nans_transparent=False, embed_avm_tags=True):
+                   make_nans_transparent=False, embed_avm_tags=True,
+                   interval_r='percentile', interval_g='percentile',
+                   interval_b='percentile'):
     """
     Make an RGB image from a FITS RGB cube or from three FITS files.
 
@@ -115,6 +121,15 @@ def make_rgb_image(data, output, indices=(0, 1, 2), vmin_r=None, vmax_r=None,
     embed_avm_tags : bool, optional
         Whether to embed AVM tags inside the image - this can only be done for
         JPEG and PNG files, and only if PyAVM is installed.
+
+    interval_r, interval_g, interval_b : { 'percentile', 'zscale', 'sigclip' }, optional
+        The method used to determine for a given channel the minimum and/or
+        maximum pixel values if the corresponding vmin_x and vmax_x are set
+        to None. 'percentile' (default) uses the corresponding pmin_x and
+        pmax_x percentiles, 'zscale' uses the IRAF zscale algorithm, and
+        'sigclip' uses the sigma-clipped median minus and plus three times
+        the sigma-clipped standard deviation. The last two are computed on
+        a fixed-size sample of the pixels.
     """
 
     try:
@@ -173,7 +188,8 @@ def make_rgb_image(data, output, indices=(0, 1, 2), vmin_r=None, vmax_r=None,
     log.info("Red:")
     image_r = Image.fromarray(_data_stretch(image_r, vmin=vmin_r, vmax=vmax_r,
                                             pmin=pmin_r, pmax=pmax_r, stretch=stretch_r,
-                                            vmid=vmid_r, exponent=exponent_r))
+                                            vmid=vmid_r, exponent=exponent_r,
+                                            interval=interval_r))
 
     log.info("Green:")
     image_g = Image.fromarray(_data_stretch(image_g,
@@ -181,7 +197,8 @@ def make_rgb_image(data, output, indices=(0, 1, 2), vmin_r=None, vmax_r=None,
                                             pmin=pmin_g, pmax=pmax_g,
                                             stretch=stretch_g,
                                             vmid=vmid_g,
-                                            exponent=exponent_g))
+                                            exponent=exponent_g,
+                                            interval=interval_g))
 
     log.info("Blue:")
     image_b = Image.fromarray(_data_stretch(image_b,
@@ -189,7 +206,8 @@ def make_rgb_image(data, output, indices=(0, 1, 2), vmin_r=None, vmax_r=None,
                                             pmin=pmin_b, pmax=pmax_b,
                                             stretch=stretch_b,
                                             vmid=vmid_b,
-                                            exponent=exponent_b))
+                                            exponent=exponent_b,
+                                            interval=interval_b))
 
     img = Image.merge("RGB", (image_r, image_g, image_b))
 
@@ -1,10 +1,21 @@
 
-def slice_hypercube(data, header, dimensions=[0, 1], slices=[]):
+def slice_hypercube(data, header, dimensions=[0, 1], slices=[], cutout=None):
     """
     Extract a slice from an n-dimensional HDU data/header pair, and return the
     new data (without changing the header).
+
+    The data can also be an HDU section (e.g. ``hdu.section``), in which case
+    only the extracted slice is read from disk.
+
+    If specified, cutout should be a tuple of two slice objects giving the
+    range of pixels to extract along the two dimensions used for the image.
     """
 
+    if cutout is None:
+        cut_x = cut_y = slice(None, None, None)
+    else:
+        cut_x, cut_y = cutout
+
     if type(slices) is int:
         slices = (slices, )
     else:
@@ -19,9 +30,13 @@ def slice_hypercube(data, header, dimensions=[0, 1], slices=[]):
     elif len(shape) == 2:
         wcsaxes_slices = ('x', 'y')
 
+        # If the data is a section, it is returned as-is so that any
+        # further slicing or downsampling only reads the required data.
         if dimensions[1] < dimensions[0]:
-            data = data.transpose()
+            data = data[cut_x, cut_y].transpose()
             wcsaxes_slices = ('y', 'x')
+        elif cutout is not None:
+            data = data[cut_y, cut_x]
 
         return data, wcsaxes_slices
 
@@ -31,13 +46,13 @@ def slice_hypercube(data, header, dimensions=[0, 1], slices=[]):
             wcsaxes_slices = slices[:]
 
             if dimensions[0] < dimensions[1]:
-                slices.insert(dimensions[0], slice(None, None, None))
-                slices.insert(dimensions[1], slice(None, None, None))
+                slices.insert(dimensions[0], cut_x)
+                slices.insert(dimensions[1], cut_y)
                 wcsaxes_slices.insert(dimensions[0], 'x')
                 wcsaxes_slices.insert(dimensions[1], 'y')
             else:
-                slices.insert(dimensions[1], slice(None, None, None))
-                slices.insert(dimensions[0], slice(None, None, None))
+                slices.insert(dimensions[1], cut_y)
+                slices.insert(dimensions[0], cut_x)
                 wcsaxes_slices.insert(dimensions[1], 'y')
                 wcsaxes_slices.insert(dimensions[0], 'x')
 
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+from astropy.io import fits
+
+from .. import FITSFigure
+from .. import cache_util
+from ..cache_util import LRUCache
+
+
+def test_lru_cache():
+    evicted = []
+    cache = LRUCache(2, on_evict=evicted.append)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert evicted == [2]
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+    cache.clear()
+    assert evicted == [2, 1, 3]
+    assert len(cache) == 0
+
+
+def test_lru_cache_disabled():
+    cache = LRUCache(0)
+    cache.set('a', 1)
+    assert cache.get('a') is None
+
+
+def test_lru_cache_sizeof():
+    cache = LRUCache(100, sizeof=lambda array: array.nbytes)
+    cache.set('a', np.zeros(5))
+    cache.set('b', np.zeros(5))
+    cache.set('a', np.zeros(6))
+    assert 'a' in cache and 'b' in cache
+    cache.set('c', np.zeros(3))
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    # Values larger than the maximum size are not kept, and don't evict
+    # other values
+    cache.set('d', np.zeros(20))
+    assert 'd' not in cache
+    assert 'a' in cache and 'c' in cache
+    # Replacing a value by one that is too large removes the old value
+    cache.set('a', np.zeros(20))
+    assert 'a' not in cache and 'c' in cache
+    assert cache._size == 24
+
+
+def test_parsed_modified(tmpdir):
+
+    # Modifying a file should cause it to be parsed again
+
+    filename = tmpdir.join('data.fits').strpath
+    fits.writeto(filename, np.zeros((4, 4)))
+
+    cache_util.clear()
+
+    f = FITSFigure(filename)
+    f.close()
+    fits.writeto(filename, np.zeros((5, 5)), overwrite=True)
+    os.utime(filename, ns=(0, 0))
+    f = FITSFigure(filename)
+    assert f._data.shape == (5, 5)
+    assert len(cache_util.PARSED) == 2
+    f.close()
+
+    cache_util.clear()
+
+
+def test_contour_cache(tmpdir):
+
+    # Check that the header and WCS are only parsed once
+
+    filename = tmpdir.join('data.fits').strpath
+    fits.writeto(filename, np.arange(256.).reshape((16, 16)))
+
+    cache_util.clear()
+
+    f = FITSFigure(filename)
+    f.show_contour(filename, levels=3)
+    f.show_contour(filename, levels=3, smooth=3)
+    assert len(cache_util.PARSED) == 1
+    f.close()
+
+    cache_util.clear()
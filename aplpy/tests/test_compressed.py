@@ -0,0 +1,47 @@
+import pytest
+import numpy as np
+from astropy.io import fits
+
+from .. import FITSFigure
+from ..tile_util import TiledSection
+
+np.random.seed(12345)
+ARRAY = np.random.random((120, 90)).astype(np.float32)
+
+
+@pytest.fixture
+def compressed_file(tmpdir):
+    filename = tmpdir.join('compressed.fits').strpath
+    hdu = fits.CompImageHDU(ARRAY, compression_type='RICE_1',
+                            tile_shape=(7, 90))
+    fits.HDUList([fits.PrimaryHDU(), hdu]).writeto(filename)
+    return filename
+
+
+@pytest.mark.parametrize('index', [Ellipsis, (slice(10, 100), slice(5, 30)),
+                                   (7, slice(5, 30)), (slice(None, None, 3),),
+                                   (slice(3, 4), slice(None))])
+def test_tiled_section(compressed_file, index):
+    with fits.open(compressed_file) as hdulist:
+        expected = hdulist[1].section[index]
+        actual = TiledSection(hdulist[1], max_workers=4)[index]
+        np.testing.assert_array_equal(actual, expected)
+
+
+def test_compressed_init(compressed_file):
+    f = FITSFigure(compressed_file)
+    with fits.open(compressed_file) as hdulist:
+        np.testing.assert_array_equal(f._data, hdulist[1].data)
+    f.show_grayscale()
+    f.close()
+
+
+def test_compressed_cutout_downsample(compressed_file):
+    with fits.open(compressed_file) as hdulist:
+        expected = hdulist[1].data[20:41, 30:51]
+    f = FITSFigure(compressed_file, cutout=(40, 30, 10), cutout_frame='pixel')
+    np.testing.assert_array_equal(f._data, expected)
+    f.close()
+    f = FITSFigure(compressed_file, downsample=3)
+    assert f._data.shape == (40, 30)
+    f.close()
@@ -1,7 +1,13 @@
 import pytest
 import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.contour import ContourSet
+from matplotlib.path import Path
+from astropy.io import fits
 
 from .. import FITSFigure
+from .. import contour_util
+from ..contour_layer import ContourLayer
 
 # Test simple contour generation with Numpy example
 
@@ -13,3 +19,273 @@ def test_numpy_contour(filled):
     f.show_grayscale()
     f.show_contour(data, levels=np.linspace(1., 254., 10), filled=filled)
     f.close()
+
+
+def _celestial_hdu(shape, crpix, cdelt=-0.01):
+    hdu = fits.PrimaryHDU(np.zeros(shape))
+    hdu.header['CTYPE1'] = 'RA---TAN'
+    hdu.header['CTYPE2'] = 'DEC--TAN'
+    hdu.header['CRVAL1'] = 30.
+    hdu.header['CRVAL2'] = 40.
+    hdu.header['CRPIX1'], hdu.header['CRPIX2'] = crpix
+    hdu.header['CDELT1'] = cdelt
+    hdu.header['CDELT2'] = abs(cdelt)
+    return hdu
+
+
+def _contour_data():
+    # A large contour image with peaks inside and outside the image
+    y, x = np.mgrid[:200, :300]
+    data = np.zeros((200, 300))
+    for xc, yc in [(150, 100), (20, 20), (280, 180)]:
+        data += np.exp(-((x - xc) ** 2 + (y - yc) ** 2) / 50.)
+    hdu = _celestial_hdu(data.shape, (151, 101))
+    hdu.data = data
+    return hdu
+
+
+def _contour_vertices(c):
+    return [path.vertices for path in c.get_paths() if len(path.vertices) > 0]
+
+
+@pytest.mark.parametrize(('filled'), [True, False])
+def test_contour_overlap(filled):
+    image = _celestial_hdu((40, 40), (20.5, 20.5))
+    contour = _contour_data()
+    f = FITSFigure(image)
+    f.show_contour(contour, levels=[0.5, 2.], filled=filled, layer='all')
+    f.show_contour(contour, levels=[0.5, 2.], filled=filled, layer='overlap',
+                   overlap=True)
+    paths_all = f._layers['all'].get_paths()
+    paths_overlap = f._layers['overlap'].get_paths()
+    # Only the central peak remains, and its contour is unchanged
+    assert len(paths_overlap) == len(paths_all)
+    vertices = np.vstack(_contour_vertices(f._layers['overlap']))
+    assert np.all(np.abs(vertices - [19.5, 19.5]) < 30)
+    vertices_all = np.vstack(_contour_vertices(f._layers['all']))
+    central = np.all(np.abs(vertices_all - [19.5, 19.5]) < 30, axis=1)
+    np.testing.assert_allclose(vertices, vertices_all[central])
+    f.close()
+
+
+def test_contour_overlap_smooth():
+    # The margin around the overlap should make the smoothing unaffected
+    image = _celestial_hdu((40, 40), (20.5, 20.5))
+    contour = _contour_data()
+    f = FITSFigure(image)
+    f.show_contour(contour, levels=[0.3, 0.6], smooth=3, layer='all')
+    f.show_contour(contour, levels=[0.3, 0.6], smooth=3, layer='overlap',
+                   overlap=True)
+    for path_all, path_overlap in zip(f._layers['all'].get_paths(),
+                                      f._layers['overlap'].get_paths()):
+        central = np.all(np.abs(path_all.vertices - [19.5, 19.5]) < 30, axis=1)
+        np.testing.assert_allclose(path_overlap.vertices,
+                                   path_all.vertices[central])
+    f.close()
+
+
+def test_contour_no_overlap():
+    image = _celestial_hdu((40, 40), (20.5, 20.5))
+    contour = _contour_data()
+    contour.header['CRVAL1'] = 40.
+    f = FITSFigure(image)
+    f.show_contour(contour, levels=[0.5], overlap=True)
+    assert len(f._layers) == 0
+    f.close()
+
+
+def _vertex_set(vertices):
+    return set(map(tuple, np.round(vertices, 8)))
+
+
+@pytest.mark.parametrize('tile_size', [7, 16, 512])
+def test_contour_lines_tiles(tile_size):
+    # Contour lines computed in tiles should be stitched back into the same
+    # lines as computed by Matplotlib
+    np.random.seed(12345)
+    y, x = np.mgrid[:40, :50]
+    data = np.sin(x / 5.) * np.cos(y / 7.) + np.random.random((40, 50)) * 0.1
+    data[20:24, 10:15] = np.nan
+    levels = [-0.5, 0., 0.5]
+    allsegs, allkinds = contour_util.contour_lines(data, levels,
+                                                   tile_size=tile_size)
+    fig = plt.figure()
+    ax = fig.add_subplot(1, 1, 1)
+    c = ax.contour(data, levels)
+    for path, segs, kinds in zip(c.get_paths(), allsegs, allkinds):
+        assert len(segs) == np.sum(path.codes == Path.MOVETO)
+        assert _vertex_set(np.vstack(segs)) == _vertex_set(path.vertices)
+        for vertices, codes in zip(segs, kinds):
+            assert codes[0] == Path.MOVETO
+            if codes[-1] == Path.CLOSEPOLY:
+                np.testing.assert_allclose(vertices[0], vertices[-1])
+    plt.close(fig)
+
+
+def test_contour_tiled_layer():
+    data = np.random.random((30, 30))
+    f = FITSFigure(data)
+    f.show_contour(data, levels=[0.3, 0.6], colors='red', linewidths=2,
+                   layer='tiled')
+    f.show_contour(data, levels=[0.3, 0.6], colors='red', corner_mask=False,
+                   layer='matplotlib')
+    assert isinstance(f._layers['tiled'], ContourLayer)
+    assert isinstance(f._layers['tiled'].contour_set, ContourSet)
+    assert isinstance(f._layers['matplotlib'], ContourSet)
+    f._layers['tiled'].clabel()
+    f.close()
+
+
+def test_contour_no_lines():
+    data = np.random.random((30, 30))
+    f = FITSFigure(data)
+    f.show_contour(data, levels=[2., 3.])
+    f.close()
+
+
+def _render(plot):
+    fig = plt.figure(figsize=(4, 3), dpi=50)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_xlim(0, 39)
+    ax.set_ylim(0, 29)
+    plot(ax)
+    fig.canvas.draw()
+    image = np.asarray(fig.canvas.buffer_rgba()).copy()
+    plt.close(fig)
+    return image
+
+
+def test_contour_bands():
+    # Filled contours computed in tiles should look the same as computed
+    # by Matplotlib
+    np.random.seed(12345)
+    data = np.random.random((30, 40))
+    data[10:14, 10:15] = np.nan
+    allsegs, allkinds = contour_util.contour_bands(data, [(0.2, 0.5)], tile_size=8)
+    expected = _render(lambda ax: ax.contourf(data, [0.2, 0.5], colors='k',
+                                              antialiased=False))
+    result = _render(lambda ax: ContourSet(ax, [0.2, 0.5], allsegs, allkinds,
+                                           filled=True, colors='k',
+                                           antialiased=False))
+    np.testing.assert_equal(result, expected)
+
+
+def test_contour_levels_incremental(monkeypatch):
+    computed = []
+    original = contour_util.contour_lines
+
+    def contour_lines(data, levels, **kwargs):
+        computed.extend(levels)
+        return original(data, levels, **kwargs)
+
+    monkeypatch.setattr(contour_util, 'contour_lines', contour_lines)
+
+    data = np.random.random((30, 30))
+    f = FITSFigure(data)
+    f.show_contour(data, levels=[0.2, 0.4], layer='contours')
+    layer = f.get_layer('contours')
+    layer.add_levels([0.6])
+    assert computed == [0.2, 0.4, 0.6]
+    np.testing.assert_equal(layer.levels, [0.2, 0.4, 0.6])
+    layer.remove_levels([0.2])
+    layer.set_levels([0.2, 0.6])
+    layer.set(colors='red', linewidths=3)
+    f.hide_layer('contours')
+    assert not layer.contour_set.get_visible()
+    f.show_layer('contours')
+    assert layer.contour_set.get_visible()
+    assert computed == [0.2, 0.4, 0.6]
+    np.testing.assert_equal(layer.contour_set.get_linewidths(), 3)
+    f.remove_layer('contours')
+    assert layer.contour_set is None
+    f.close()
+
+
+def test_contour_levels_filled_incremental():
+    data = np.random.random((30, 30))
+    f = FITSFigure(data)
+    f.show_contour(data, levels=[0.2, 0.4, 0.6], filled=True, layer='contours')
+    layer = f.get_layer('contours')
+    assert len(layer.get_paths()) == 2
+    layer.add_levels(0.8)
+    assert len(layer.get_paths()) == 3
+    f.close()
+
+
+def _n_vertices(layer):
+    return sum(len(path.vertices) for path in layer.get_paths())
+
+
+def test_contour_simplify(tmpdir):
+    np.random.seed(12345)
+    data = np.random.random((100, 100))
+    f = FITSFigure(data, figsize=(5, 5))
+    f.show_contour(data, levels=[0.5], layer='full')
+    f.show_contour(data, levels=[0.5], simplify=2, layer='simplified')
+    n_full = _n_vertices(f.get_layer('full'))
+    n_simplified = _n_vertices(f.get_layer('simplified'))
+    assert n_simplified < n_full / 2
+    # Zooming in shows more details
+    f.recenter(50, 50, width=10, height=10)
+    f.save(tmpdir.join('zoom.png').strpath)
+    n_zoomed = _n_vertices(f.get_layer('simplified'))
+    assert n_simplified < n_zoomed <= n_full
+    f.save(tmpdir.join('zoom.pdf').strpath)
+    f.close()
+
+
+def test_contour_min_area():
+    np.random.seed(12345)
+    data = np.random.random((100, 100))
+    f = FITSFigure(data, figsize=(5, 5))
+    f.show_contour(data, levels=[0.5], layer='full')
+    f.show_contour(data, levels=[0.5], min_area=100, layer='large',
+                   filled=False)
+    n_full = np.sum(f.get_layer('full').get_paths()[0].codes == Path.MOVETO)
+    codes = f.get_layer('large').get_paths()[0].codes
+    n_large = np.sum(codes == Path.MOVETO)
+    assert n_large < n_full
+    f.close()
+
+
+def test_contour_simplify_utility():
+    t = np.linspace(0., 2 * np.pi, 1000)
+    circle = np.column_stack([10 * np.cos(t), 10 * np.sin(t)])
+    circle[-1] = circle[0]
+    codes = np.full(1000, Path.LINETO, dtype=Path.code_type)
+    codes[0], codes[-1] = Path.MOVETO, Path.CLOSEPOLY
+    path = Path(np.vstack([circle, circle * 0.1 + 50]), np.hstack([codes, codes]))
+    paths = contour_util.simplify_paths([path], tolerance=0.1, min_area=5.)
+    assert np.sum(paths[0].codes == Path.MOVETO) == 1
+    assert paths[0].codes[-1] == Path.CLOSEPOLY
+    assert len(paths[0].vertices) < 100
+    distance = np.hypot(paths[0].vertices[:, 0], paths[0].vertices[:, 1])
+    np.testing.assert_allclose(distance, 10.)
+
+
+def test_contour_reproject():
+    # Resampling the contour data onto the image pixels should give nearly
+    # the same contours as transforming the contours
+    image = _celestial_hdu((40, 40), (20.5, 20.5), cdelt=-0.02)
+    contour = _contour_data()
+    f = FITSFigure(image)
+    f.show_contour(contour, levels=[0.5], layer='transformed')
+    f.show_contour(contour, levels=[0.5], layer='reprojected', reproject=True)
+    f.show_contour(contour, levels=[0.5], layer='both', reproject=True,
+                   overlap=True)
+    transformed = f.get_layer('transformed').get_paths()[0].vertices
+    transformed = transformed[np.all(np.abs(transformed - 19.5) < 10, axis=1)]
+    center = transformed.mean(axis=0)
+    radius = np.hypot(*(transformed - center).T).mean()
+    for layer in ['reprojected', 'both']:
+        vertices = f.get_layer(layer).get_paths()[0].vertices
+        np.testing.assert_allclose(vertices.mean(axis=0), center, atol=0.1)
+        np.testing.assert_allclose(np.hypot(*(vertices - center).T), radius, atol=0.2)
+    f.close()
+
+
+def test_contour_reproject_pixel():
+    data = np.random.random((30, 30))
+    f = FITSFigure(data)
+    f.show_contour(data, levels=[0.5], reproject=True)
+    f.close()
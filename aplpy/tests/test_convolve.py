@@ -1,7 +1,14 @@
+import warnings
+
+import pytest
 import numpy as np
 from astropy.io import fits
+from astropy.convolution import (convolve as astropy_convolve,
+                                 Gaussian2DKernel, Box2DKernel)
 
 from .. import FITSFigure
+from .. import convolve_util
+from ..convolve_util import convolve
 
 ARRAY = np.arange(256).reshape((16, 16))
 
@@ -40,3 +47,119 @@ def test_convolve_int():
     f = FITSFigure(hdu)
     f.show_grayscale(smooth=3)
     f.close()
+
+
+def _astropy_convolve(image, kernel):
+    image = image.copy()
+    image[np.isinf(image)] = np.nan
+    with warnings.catch_warnings():
+        # Warning about regions of NaN values larger than the kernel
+        warnings.simplefilter('ignore')
+        return astropy_convolve(image, kernel, boundary='extend')
+
+
+def _reference_image():
+    np.random.seed(12345)
+    image = np.random.random((60, 70))
+    image[20:40, 30:50] = np.nan
+    image[5, 7] = np.nan
+    image[50, 50] = np.inf
+    return image
+
+
+@pytest.mark.parametrize(('kernel', 'smooth'), (('gauss', 1), ('gauss', 3),
+                                                ('box', 1), ('box', 3)))
+def test_convolve_separable(kernel, smooth):
+    image = _reference_image()
+    if kernel == 'gauss':
+        kernel_object = Gaussian2DKernel(smooth, x_size=smooth * 5, y_size=smooth * 5)
+    else:
+        kernel_object = Box2DKernel(smooth, x_size=smooth * 5, y_size=smooth * 5)
+    expected = _astropy_convolve(image, kernel_object)
+    result = convolve(image, smooth=smooth, kernel=kernel)
+    np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize('shape', ((3, 5), (15, 13), (5, 21)))
+def test_convolve_custom_kernels(shape):
+    # Small non-separable kernels use direct summation, larger ones use FFTs
+    image = _reference_image()
+    kernel = np.random.random(shape)
+    expected = _astropy_convolve(image, kernel)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        result = convolve(image, smooth=None, kernel=kernel)
+    np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-12)
+
+
+def test_convolve_no_nan():
+    image = np.random.random((30, 40))
+    expected = _astropy_convolve(image, Gaussian2DKernel(3, x_size=15, y_size=15))
+    result = convolve(image, smooth=3, kernel='gauss')
+    np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize(('kernel', 'smooth'), (('gauss', 3), ('box', 3),
+                                                (np.random.random((3, 5)), None),
+                                                (np.random.random((15, 13)), None)))
+def test_convolve_parallel(kernel, smooth):
+    # Splitting the image into bands should not change the results,
+    # including at the edges of the image and around NaN values
+    image = np.random.random((203, 70))
+    image[:3] = np.nan
+    image[100:150, 20:30] = np.nan
+    image[160, 40] = np.inf
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = convolve(image, smooth=smooth, kernel=kernel, max_workers=1)
+        result = convolve(image, smooth=smooth, kernel=kernel, max_workers=4)
+    np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-12)
+
+
+def test_kernel_key():
+    kernel = np.random.random((5, 5))
+    assert convolve_util.kernel_key(3, 'gauss') == convolve_util.kernel_key(3, 'gauss')
+    assert convolve_util.kernel_key(3, 'gauss') != convolve_util.kernel_key(5, 'gauss')
+    assert convolve_util.kernel_key(None, kernel) == convolve_util.kernel_key(None, kernel.copy())
+    assert convolve_util.kernel_key(None, kernel) != convolve_util.kernel_key(None, kernel * 2)
+
+
+def test_smoothed_cache(monkeypatch):
+    calls = []
+    original = convolve_util.convolve
+
+    def convolve_counted(*args, **kwargs):
+        calls.append(kwargs)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(convolve_util, 'convolve', convolve_counted)
+
+    hdu = fits.PrimaryHDU(np.random.random((16, 16)))
+    f = FITSFigure(hdu)
+    f.show_grayscale(smooth=3)
+    f.show_grayscale(smooth=3, vmin=0.2, vmax=0.8)
+    f.show_contour(smooth=3, levels=3)
+    assert len(calls) == 1
+    f.show_contour(smooth=5, levels=3)
+    f.show_contour(smooth=None, kernel=np.ones((3, 3)), levels=3)
+    f.show_colorscale(smooth=None, kernel=np.ones((3, 3)))
+    assert len(calls) == 3
+    f.close()
+
+
+def test_smoothed_cache_size():
+    data = np.random.random((32, 32))
+    f = FITSFigure(data, smooth_cache_size=32 * 32 * 8)
+    # The data is not cached if it is not smoothed
+    assert f._get_smoothed_data(None, 'gauss') is f._data
+    assert len(f._smoothed) == 0
+    smoothed = f._get_smoothed_data(3, 'gauss')
+    assert f._get_smoothed_data(3, 'gauss') is smoothed
+    assert f._get_smoothed_data(None, 'box') is f._data
+    assert len(f._smoothed) == 1
+    f.close()
+    # Smoothed images larger than the cache size are not cached
+    f = FITSFigure(data, smooth_cache_size=1000)
+    f._get_smoothed_data(3, 'gauss')
+    assert len(f._smoothed) == 0
+    f.close()
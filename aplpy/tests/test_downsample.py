@@ -1,6 +1,9 @@
+import pytest
 import numpy as np
+from astropy.io import fits
 
 from .. import FITSFigure
+from .. import downsample_util
 
 
 def test_numpy_downsample():
@@ -8,3 +11,59 @@ def test_numpy_downsample():
     f = FITSFigure(data, downsample=2)
     f.show_grayscale()
     f.close()
+
+
+def test_numpy_downsample_tuple():
+    data = np.arange(600).reshape((20, 30))
+    f = FITSFigure(data, downsample=(3, 2))
+    assert f._data.shape == (10, 10)
+    assert f._wcs.nx == 30 and f._wcs.ny == 20
+    f.show_grayscale()
+    f.close()
+
+
+def test_downsample_nan():
+    data = np.ones((16, 16))
+    data[0, 0] = np.nan
+    data[2:4, 2:4] = np.nan
+    f = FITSFigure(data, downsample=2)
+    assert f._data[0, 0] == 1
+    assert np.isnan(f._data[1, 1])
+    f.close()
+
+
+@pytest.mark.parametrize('func', sorted(downsample_util.FUNCTIONS))
+def test_downsample_chunked(func):
+    # Check that processing the data in bands gives the same result as
+    # processing it in one go
+    np.random.seed(12345)
+    data = np.random.random((35, 27))
+    data[data < 0.1] = np.nan
+    expected = downsample_util.downsample(data, (3, 2), func=func)
+    actual = downsample_util.downsample(data, (3, 2), func=func,
+                                        chunk_size=1000)
+    assert expected.shape == (17, 9)
+    np.testing.assert_array_equal(expected, actual)
+
+
+def test_downsample_invalid():
+    with pytest.raises(ValueError) as exc:
+        downsample_util.downsample(np.ones((4, 4)), 2, func='spam')
+    assert exc.value.args[0] == "Unknown downsampling function: spam"
+    with pytest.raises(ValueError):
+        downsample_util.downsample(np.ones((4, 4)), (1, 2, 3))
+
+
+def test_file_downsample_lazy(tmpdir):
+    data = np.arange(256).reshape((16, 16)).astype(np.int16)
+    hdu = fits.PrimaryHDU(data)
+    hdu.header['BSCALE'] = 2.
+    hdu.header['BZERO'] = 10.
+    filename = tmpdir.join('image.fits').strpath
+    hdu.writeto(filename)
+    f1 = FITSFigure(filename, downsample=4)
+    f2 = FITSFigure(filename, downsample=4, lazy=True)
+    np.testing.assert_array_equal(f1._data, f2._data)
+    f2.show_grayscale()
+    f1.close()
+    f2.close()
@@ -29,6 +29,24 @@ def test_file_init(tmpdir):
     f.close()
 
 
+# Test lazy initialization through a filename - the slice extracted should be
+# the same as when reading in the whole cube
+@pytest.mark.parametrize(('dimensions'), VALID_DIMENSIONS)
+def test_file_init_lazy(tmpdir, dimensions):
+    data = np.arange(16 * 16 * 16).reshape((16, 16, 16)).astype(np.int16)
+    hdu = fits.PrimaryHDU(data)
+    hdu.header['BSCALE'] = 2.
+    hdu.header['BZERO'] = 10.
+    filename = tmpdir.join('cube_lazy.fits').strpath
+    hdu.writeto(filename)
+    f1 = FITSFigure(filename, dimensions=dimensions, slices=[5])
+    f2 = FITSFigure(filename, dimensions=dimensions, slices=[5], lazy=True)
+    np.testing.assert_array_equal(f1._data, f2._data)
+    f2.show_grayscale()
+    f1.close()
+    f2.close()
+
+
 # Test initialization through an HDU object
 def test_hdu_init():
     hdu = generate_hdu(REFERENCE)
@@ -4,8 +4,9 @@ import pytest
 import numpy as np
 from astropy.io import fits
 from astropy.wcs import WCS as AstropyWCS
+from astropy.nddata import NDData
 
-from .helpers import generate_file, generate_hdu, generate_wcs
+from .helpers import generate_file, generate_hdu, generate_wcs, generate_header
 from .. import FITSFigure
 
 # The tests in this file check that the initialization and basic plotting do
@@ -59,6 +60,14 @@ def test_file_init(tmpdir):
     f.close()
 
 
+# Test lazy initialization through a filename
+def test_file_init_lazy(tmpdir):
+    filename = generate_file(REFERENCE, str(tmpdir))
+    f = FITSFigure(filename, lazy=True)
+    f.show_grayscale()
+    f.close()
+
+
 # Test initialization through an HDU object
 def test_hdu_init():
     hdu = generate_hdu(REFERENCE)
@@ -67,6 +76,39 @@ def test_hdu_init():
     f.close()
 
 
+# Test initialization through a memory-mapped array, which should not be copied
+def test_memmap_init(tmpdir):
+    filename = tmpdir.join('data.dat').strpath
+    data = np.memmap(filename, dtype=float, mode='w+', shape=(16, 16))
+    data[...] = np.arange(256).reshape((16, 16))
+    f = FITSFigure(data)
+    assert np.shares_memory(f._data, data)
+    f.show_grayscale()
+    f.close()
+
+
+# Test initialization through a masked array
+def test_masked_init():
+    data = np.ma.masked_array(np.arange(256.).reshape((16, 16)))
+    data[3:5, 6:8] = np.ma.masked
+    f = FITSFigure(data)
+    assert np.sum(np.isnan(f._data)) == 4
+    f.show_grayscale()
+    f.close()
+
+
+# Test initialization through an NDData object with a WCS and a mask
+def test_nddata_init():
+    wcs = generate_wcs(REFERENCE)
+    data = np.arange(256.).reshape((16, 16))
+    nddata = NDData(data, wcs=wcs, mask=data > 250)
+    f = FITSFigure(nddata)
+    assert f._wcs.wcs.ctype[0] == wcs.wcs.ctype[0]
+    assert np.sum(np.isnan(f._data)) == 5
+    f.show_grayscale()
+    f.close()
+
+
 # Test initialization through a WCS object
 def test_wcs_init():
     wcs = generate_wcs(REFERENCE)
@@ -75,6 +117,25 @@ def test_wcs_init():
     f.close()
 
 
+# Test that initialization through a WCS object does not allocate any data
+def test_wcs_init_no_data():
+    wcs = generate_wcs(REFERENCE)
+    f = FITSFigure(wcs)
+    assert f._data.shape == (wcs.pixel_shape[1], wcs.pixel_shape[0])
+    assert f._data.strides == (0, 0)
+    f.close()
+
+
+# Test initialization through a header
+def test_header_init():
+    header = generate_header(REFERENCE)
+    f = FITSFigure(header)
+    assert f._data.shape == (header['NAXIS2'], header['NAXIS1'])
+    assert f._data.strides == (0, 0)
+    f.show_grayscale()
+    f.close()
+
+
 # Test initialization through a WCS object with wcs.to_header() as a go-between
 # specifically for testing the cd -> pc -> cd hack, and has particular importance
 # for AVM-generated headers
@@ -192,3 +253,73 @@ def test_not_first_hdu(tmpdir):
 
     f = FITSFigure(filename)
     assert f._data.shape == (12, 12)
+
+
+def test_not_first_hdu_compressed(tmpdir):
+
+    # Test that HDUs with empty axes are skipped, and that compressed HDUs
+    # are found by looking at the headers alone
+
+    filename = tmpdir.join('test.fits').strpath
+
+    hdu0 = fits.PrimaryHDU()
+    hdu1 = fits.ImageHDU(np.zeros((0, 12)))
+    hdu2 = fits.CompImageHDU(np.ones((12, 14)))
+
+    hdulist = fits.HDUList([hdu0, hdu1, hdu2])
+
+    hdulist.writeto(filename)
+
+    f = FITSFigure(filename)
+    assert f._data.shape == (12, 14)
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_cutout_world(tmpdir, lazy):
+
+    # Test that a cutout only includes the requested region, and that the
+    # WCS is adjusted so that world coordinates are unchanged
+
+    filename = generate_file(REFERENCE, str(tmpdir))
+    data = np.arange(192 * 192).reshape((192, 192))
+    fits.update(filename, data.astype(float), header=fits.getheader(filename))
+
+    f_full = FITSFigure(filename)
+    xw, yw = f_full.pixel2world(50, 40)
+
+    f = FITSFigure(filename, cutout=(xw, yw, 0.5), lazy=lazy)
+    assert f._data.shape == (16, 16)
+    xp, yp = f.world2pixel(xw, yw)
+    np.testing.assert_allclose((xp, yp), (7, 8))
+    assert f._data[8, 7] == data[40, 50]
+    f.show_grayscale()
+
+    f_full.close()
+    f.close()
+
+
+def test_cutout_pixel():
+    data = np.arange(256).reshape((16, 16))
+    f = FITSFigure(data, cutout=(5, 6, 2, 4), cutout_frame='pixel')
+    assert f._data.shape == (5, 3)
+    assert f._data[0, 0] == data[4, 4]
+    f.close()
+
+
+def test_cutout_slices():
+    # Regression test for a bug that caused the WCSAxes slices to be swapped
+    # for cutouts rather than for transposed images
+    data = np.arange(256).reshape((16, 16))
+    f = FITSFigure(data, cutout=(5, 6, 2, 4), cutout_frame='pixel')
+    assert f._wcsaxes_slices == ('x', 'y')
+    f.close()
+    f = FITSFigure(data, dimensions=[1, 0])
+    assert f._wcsaxes_slices == ('y', 'x')
+    f.close()
+
+
+def test_cutout_outside():
+    data = np.arange(256).reshape((16, 16))
+    with pytest.raises(Exception) as exc:
+        FITSFigure(data, cutout=(50, 50, 2), cutout_frame='pixel')
+    assert exc.value.args[0] == "Cutout region falls outside the image"
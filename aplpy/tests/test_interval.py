@@ -0,0 +1,193 @@
+import pytest
+import numpy as np
+
+from .. import FITSFigure
+from .. import interval_util
+from ..interval_util import (Histogram, histogram, percentile_limits,
+                             exact_percentile, sample_limits)
+
+np.random.seed(12345)
+ARRAY = np.random.random((300, 400))
+
+
+def test_percentile_limits():
+    vmin, vmax = percentile_limits(ARRAY, 0.25, 99.75)
+    assert abs(vmin - 0.0025) < 0.01
+    assert abs(vmax - 0.9975) < 0.01
+    assert percentile_limits(ARRAY, 0.25, 99.75) == (vmin, vmax)
+
+
+def test_percentile_limits_small():
+    vmin, vmax = percentile_limits(np.arange(11.), 0, 50)
+    assert vmin == 0
+    np.testing.assert_allclose(vmax, 5, atol=0.01)
+
+
+def test_percentile_limits_no_finite():
+    assert percentile_limits(np.full((10, 10), np.nan), 0, 100) == (0, 0)
+
+
+def test_percentile_limits_sparse():
+    # Make sure that isolated finite values are found
+    array = np.full((1000, 1000), np.nan)
+    array[1, 1] = 3.
+    assert percentile_limits(array, 0, 100) == (3, 3)
+
+
+def test_histogram():
+    hist = histogram(ARRAY, chunk_size=10000)
+    assert hist.total == ARRAY.size
+    assert hist.min == ARRAY.min() and hist.max == ARRAY.max()
+    q = [0, 0.25, 50, 99.75, 100]
+    np.testing.assert_allclose(hist.percentile(q), np.percentile(ARRAY, q),
+                               atol=hist.error)
+
+
+def test_histogram_extend():
+    # Check that the range is extended correctly when values outside the
+    # current range are added.
+    values = np.random.normal(size=30000)
+    hist = Histogram()
+    hist.update(values[:1] * 1e-8)
+    hist.update(values[1:10000])
+    hist.update(values[10000:] * 1e5 + 1e9)
+    all_values = np.hstack([values[:1] * 1e-8, values[1:10000],
+                            values[10000:] * 1e5 + 1e9])
+    assert hist.counts.sum() == hist.total == all_values.size
+    q = [0, 10, 33, 50, 90, 100]
+    np.testing.assert_allclose(hist.percentile(q), np.percentile(all_values, q),
+                               atol=hist.error)
+    np.testing.assert_allclose(exact_percentile(all_values, q, hist),
+                               np.percentile(all_values, q), rtol=1e-15)
+
+
+@pytest.mark.parametrize(('loc', 'outlier'), ((100., 1e12), (0., -1e30),
+                                              (0., 3e38), (0., np.inf)))
+def test_percentile_limits_outlier(loc, outlier):
+    # A single extreme value makes almost all values fall in the same bin of
+    # the histogram, so the limits have to be determined from the values
+    array = np.random.normal(loc, 1., size=(300, 400)).astype(np.float32)
+    array[100, 200] = outlier
+    expected = np.percentile(array[np.isfinite(array)], [0.25, 99.75])
+    np.testing.assert_allclose(percentile_limits(array, 0.25, 99.75), expected,
+                               rtol=1e-12)
+
+
+@pytest.mark.parametrize(('pmin', 'pmax'), ((0, 100), (0.25, 99.75), (10, 50)))
+def test_percentile_limits_discrete(pmin, pmax):
+    array = np.arange(256.)
+    np.testing.assert_allclose(percentile_limits(array, pmin, pmax),
+                               np.percentile(array, [pmin, pmax]), rtol=1e-15)
+
+
+def test_percentile_limits_large_bins(monkeypatch):
+    # Check that bins with many values are split up, including bins where
+    # all values are equal
+    monkeypatch.setattr(interval_util, 'MAX_EXACT', 100)
+    array = np.random.normal(size=100000)
+    array[:20000] = 3.
+    array[-1] = 1e20
+    q = [0, 0.25, 1, 50, 80, 90, 99.75, 100]
+    np.testing.assert_allclose(exact_percentile(array, q, histogram(array)),
+                               np.percentile(array, q), rtol=1e-15)
+
+
+def test_histogram_cube():
+    cube = np.random.random((5, 20, 30))
+    cube[1] = np.nan
+    hist = histogram(cube, chunk_size=1000)
+    assert hist.total == 4 * 20 * 30
+
+
+def test_percentile_limits_histogram_only():
+    hist = histogram(ARRAY)
+    vmin, vmax = percentile_limits(None, 0.25, 99.75, hist=hist, exact=False)
+    np.testing.assert_allclose([vmin, vmax], np.percentile(ARRAY, [0.25, 99.75]),
+                               atol=2 * hist.error)
+    assert percentile_limits(ARRAY, 0.25, 99.75, hist=hist, exact=False) == (vmin, vmax)
+    with pytest.raises(ValueError) as exc:
+        percentile_limits(None, 0.25, 99.75)
+    assert exc.value.args[0] == "data and hist cannot both be None"
+
+
+def test_auto_limits_scans(monkeypatch):
+
+    # The data should be read once for the histogram and once to determine
+    # the exact limits, and restyling should not read the data again
+
+    scans = []
+    original = interval_util._chunks
+
+    def chunks_counted(data, **kwargs):
+        scans.append(data.shape)
+        return original(data, **kwargs)
+
+    monkeypatch.setattr(interval_util, '_chunks', chunks_counted)
+
+    f = FITSFigure(ARRAY)
+    f.show_colorscale()
+    assert len(scans) == 2
+    f.show_grayscale()
+    f.set_theme('publication')
+    f.show_colorscale(stretch='sqrt')
+    assert len(scans) == 2
+    f.show_colorscale(pmin=1.)
+    assert len(scans) == 3
+    f.close()
+
+
+def test_auto_limits_cached(monkeypatch):
+
+    from .. import interval_util
+
+    calls = []
+
+    def histogram_counted(data):
+        calls.append(data.shape)
+        return histogram(data)
+
+    monkeypatch.setattr(interval_util, 'histogram', histogram_counted)
+
+    f = FITSFigure(ARRAY)
+    f.show_colorscale()
+    f.show_grayscale()
+    f.set_theme('publication')
+    f.show_colorscale(pmin=1.)
+    assert calls == [ARRAY.shape]
+    f.close()
+
+
+def test_sample_limits_zscale():
+    array = np.random.normal(size=(2000, 2000))
+    array[1000, 1000] = 1e10
+    vmin, vmax = sample_limits(array, 'zscale')
+    # The outlier should not affect the limits
+    assert -20 < vmin < -1 and 1 < vmax < 20
+
+
+def test_sample_limits_sigclip():
+    array = np.random.normal(size=(2000, 2000))
+    array[::7, ::7] = 1e10
+    vmin, vmax = sample_limits(array, 'sigclip')
+    assert abs(vmin + 3) < 0.2 and abs(vmax - 3) < 0.2
+
+
+def test_sample_limits_no_finite():
+    assert sample_limits(np.full((10, 10), np.nan), 'zscale') == (0, 0)
+
+
+@pytest.mark.parametrize('interval', ('zscale', 'sigclip'))
+def test_show_colorscale_interval(interval):
+    f = FITSFigure(ARRAY)
+    f.show_colorscale(interval=interval)
+    f.show_grayscale(interval=interval)
+    f.close()
+
+
+def test_show_colorscale_interval_invalid():
+    f = FITSFigure(ARRAY)
+    with pytest.raises(ValueError) as exc:
+        f.show_colorscale(interval='minmax')
+    assert exc.value.args[0] == ("interval= should be one of 'percentile', "
+                                 "'zscale', 'sigclip'")
+    f.close()
@@ -0,0 +1,226 @@
+import pytest
+import numpy as np
+from astropy.io import fits
+from astropy.visualization import simple_norm
+
+from .. import FITSFigure
+from ..lut_util import BAD_INDEX, LUTNormalize, quantize
+
+np.random.seed(12345)
+ARRAY = np.random.random((100, 120)) * 10
+ARRAY[3, 4] = np.nan
+ARRAY[5, 6] = np.inf
+
+
+def test_quantize():
+    index = quantize(ARRAY, 1., 9., chunk_size=1000)
+    assert index.dtype == np.uint16
+    assert index[3, 4] == BAD_INDEX
+    assert index[5, 6] == 65534
+    assert index[ARRAY < 1].max() == 0
+    expected = np.rint((ARRAY[20] - 1) / 8 * 65534)
+    np.testing.assert_array_equal(index[20], np.clip(expected, 0, 65534))
+
+
+def test_lut_normalize():
+    normalizer = simple_norm(ARRAY, stretch='log', vmin=1., vmax=9.,
+                             clip=False)
+    lut_normalizer = LUTNormalize(normalizer)
+    index = quantize(ARRAY, 1., 9.)
+    result = lut_normalizer(index.astype(float))
+    expected = normalizer(ARRAY)
+    inside = (ARRAY > 1) & (ARRAY < 9)
+    np.testing.assert_allclose(result[inside], expected[inside], atol=1e-3)
+    assert np.isnan(result[3, 4])
+
+
+@pytest.mark.parametrize('stretch', ('linear', 'log', 'arcsinh'))
+def test_show_colorscale_lut(stretch):
+    f = FITSFigure(ARRAY)
+    f.show_colorscale(stretch=stretch, vmin=1, vmax=9, lut=True)
+    assert f.image.get_array().dtype == np.uint16
+    f.add_colorbar()
+    f.set_nan_color('red')
+    f.show_colorscale(stretch=stretch, vmin=1, vmax=9, lut=True,
+                      interpolation='bilinear')
+    f._figure.canvas.draw()
+    f.show_colorscale(stretch=stretch, vmin=1, vmax=9)
+    f._figure.canvas.draw()
+    f.close()
+
+
+def test_lut_normalize_scalar():
+    normalizer = simple_norm(ARRAY, stretch='log', vmin=1., vmax=9.,
+                             clip=False)
+    lut_normalizer = LUTNormalize(normalizer)
+    index = quantize(ARRAY, 1., 9.)
+    assert np.ndim(lut_normalizer(index[10, 10])) == 0
+    assert lut_normalizer(index[10, 10]) == lut_normalizer(index[10:11, 10])[0]
+    np.testing.assert_allclose(lut_normalizer.data_values(index[10, 10]),
+                               ARRAY[10, 10], atol=lut_normalizer.resolution)
+    # The inverse maps normalized values back to indices
+    np.testing.assert_allclose(lut_normalizer.inverse(lut_normalizer(index[10])),
+                               index[10], atol=1e-3)
+
+
+@pytest.mark.parametrize('prerender', (False, True))
+def test_show_colorscale_lut_cursor(prerender):
+    # The cursor should show the data values rather than the indices
+    f = FITSFigure(ARRAY)
+    f.show_colorscale(vmin=1, vmax=9, stretch='sqrt', lut=True,
+                      prerender=prerender)
+    index = f.image.get_array()[10, 10]
+    value = float(f.image.format_cursor_data(index).strip('[]'))
+    np.testing.assert_allclose(value, ARRAY[10, 10], rtol=1e-4)
+    assert f.image.format_cursor_data(f.image.get_array()[3, 4]) == '[nan]'
+    f.close()
+
+
+def test_show_colorscale_lut_pyramid():
+    f = FITSFigure(ARRAY)
+    with pytest.raises(ValueError) as exc:
+        f.show_colorscale(lut=True, pyramid=True)
+    assert exc.value.args[0] == "lut= and pyramid= cannot be used together"
+    f.close()
+
+
+def generate_raw_file(tmpdir, dtype=np.int16, bscale=0.5, bzero=10.,
+                      blank=-100):
+    filename = tmpdir.join('raw.fits').strpath
+    info = np.iinfo(dtype)
+    raw = np.random.randint(info.min, info.max, size=(50, 60)).astype(dtype)
+    raw[10, 10] = blank
+    hdu = fits.PrimaryHDU(raw)
+    hdu.header['BSCALE'] = bscale
+    hdu.header['BZERO'] = bzero
+    hdu.header['BLANK'] = blank
+    hdu.writeto(filename)
+    return filename
+
+
+def test_raw_integers(tmpdir):
+
+    filename = generate_raw_file(tmpdir)
+
+    f_raw = FITSFigure(filename, raw=True, figsize=(3, 3))
+    assert f_raw._data.dtype.kind == 'i'
+    assert 'BSCALE' not in f_raw._header
+    f_raw.show_colorscale(stretch='log', vmin=-10000, vmax=15000, vmid=-20000)
+    assert f_raw.image.get_array().dtype.kind == 'i'
+
+    f = FITSFigure(filename, figsize=(3, 3))
+    assert f._data.dtype.kind == 'f'
+    f.show_colorscale(stretch='log', vmin=-10000, vmax=15000, vmid=-20000)
+
+    for figure in (f_raw, f):
+        figure.set_nan_color('red')
+        figure._figure.canvas.draw()
+    image_raw = np.asarray(f_raw._figure.canvas.buffer_rgba())
+    image = np.asarray(f._figure.canvas.buffer_rgba())
+    np.testing.assert_array_equal(image_raw, image)
+
+    # Percentiles should be exact
+    values = f._data[np.isfinite(f._data)]
+    f_raw.show_colorscale(stretch='sqrt', pmin=1, pmax=90)
+    assert f_raw.image.norm.data_norm.vmin == np.percentile(values, 1)
+    assert f_raw.image.norm.data_norm.vmax == np.percentile(values, 90)
+
+    f_raw.close()
+    f.close()
+
+
+@pytest.mark.parametrize('interval', ('zscale', 'sigclip'))
+def test_raw_integers_interval(tmpdir, interval):
+    filename = generate_raw_file(tmpdir)
+    f_raw = FITSFigure(filename, raw=True)
+    f_raw.show_colorscale(interval=interval)
+    f = FITSFigure(filename)
+    f.show_colorscale(interval=interval)
+    np.testing.assert_allclose(f_raw.image.norm.data_norm.vmin, f.image.norm.vmin)
+    np.testing.assert_allclose(f_raw.image.norm.data_norm.vmax, f.image.norm.vmax)
+    f_raw.close()
+    f.close()
+
+
+def test_raw_integers_unsigned(tmpdir):
+    filename = tmpdir.join('uint16.fits').strpath
+    data = np.arange(3000, dtype=np.uint16).reshape((50, 60)) * 20
+    fits.writeto(filename, data)
+    f = FITSFigure(filename, raw=True)
+    assert f._data.dtype == np.dtype('>i2')
+    np.testing.assert_array_equal(f._scaling.scale(f._data), data)
+    f.show_colorscale(pmin=0, pmax=100, stretch='sqrt')
+    assert f.image.norm.data_norm.vmax == 59980
+    f.close()
+
+
+def test_raw_integers_smooth_contour(tmpdir):
+    filename = generate_raw_file(tmpdir)
+    f = FITSFigure(filename, raw=True)
+    f.show_colorscale(smooth=3)
+    assert f.image.get_array().dtype.kind == 'f'
+    f.show_contour(levels=3)
+    f.close()
+
+
+def test_raw_integers_downsample(tmpdir):
+    filename = generate_raw_file(tmpdir, blank=-32768)
+    f_raw = FITSFigure(filename, raw=True, downsample=2)
+    f = FITSFigure(filename, downsample=2)
+    assert f_raw._scaling is None
+    np.testing.assert_allclose(f_raw._data, f._data)
+    f_raw.close()
+    f.close()
+
+
+def test_raw_float(tmpdir):
+    filename = tmpdir.join('float.fits').strpath
+    fits.writeto(filename, np.random.random((20, 20)))
+    f = FITSFigure(filename, raw=True)
+    assert f._scaling is None
+    f.close()
+
+
+def test_raw_integers_cursor(tmpdir):
+    # The cursor should show the physical values rather than the raw values
+    filename = generate_raw_file(tmpdir)
+    f_raw = FITSFigure(filename, raw=True)
+    f_raw.show_colorscale(stretch='sqrt', vmin=-10000, vmax=15000)
+    f = FITSFigure(filename)
+    raw = f_raw.image.get_array()
+    value = float(f_raw.image.format_cursor_data(raw[20, 30]).strip('[]'))
+    assert value == f._data[20, 30]
+    assert f_raw.image.format_cursor_data(raw[10, 10]) == '[nan]'
+    assert f_raw.image.norm(raw[20, 30]) == f_raw.image.norm(raw[20:21, 30])[0]
+    f_raw.close()
+    f.close()
+
+
+def test_raw_integers_open_once(tmpdir, monkeypatch):
+
+    opened = []
+    original = fits.open
+
+    def open_counted(*args, **kwargs):
+        opened.append(kwargs)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(fits, 'open', open_counted)
+
+    f = FITSFigure(generate_raw_file(tmpdir), raw=True)
+    assert opened == [{'do_not_scale_image_data': True}]
+    f.close()
+
+
+def test_raw_scaled_int32(tmpdir):
+    # Data that can't be shown through a lookup table is read in again with
+    # the scaling applied
+    filename = tmpdir.join('int32.fits').strpath
+    hdu = fits.PrimaryHDU(np.arange(400, dtype=np.int32).reshape((20, 20)))
+    hdu.header['BSCALE'] = 2.
+    hdu.header['BZERO'] = 1.
+    hdu.writeto(filename)
+    f = FITSFigure(filename, raw=True)
+    assert f._scaling is None
+    np.testing.assert_allclose(f._data, np.arange(400).reshape((20, 20)) * 2. + 1.)
+    f.close()
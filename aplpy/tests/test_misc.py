@@ -1,4 +1,9 @@
+import os
+
+import pytest
 import numpy as np
+import matplotlib.pyplot as plt
+from astropy.io import fits
 
 from ..core import FITSFigure
 
@@ -39,3 +44,92 @@ def test_stretches():
     f.show_grayscale(stretch='arcsinh', vmid=10)
     f.show_grayscale(stretch='power', exponent=3.0)
     f.close()
+
+
+def test_context_manager(tmpdir):
+
+    # Make sure that files are closed once the data has been read in, and
+    # that the figure is closed when exiting the with block
+
+    filename = tmpdir.join('data.fits').strpath
+    fits.writeto(filename, np.arange(256.).reshape((16, 16)))
+
+    with FITSFigure(filename) as f:
+        assert f._hdulists == []
+        f.show_grayscale()
+        f.show_contour(filename, levels=3)
+        f.show_vectors(filename, filename, step=4)
+        assert f._hdulists == []
+        figure = f._figure
+
+    assert not plt.fignum_exists(figure.number)
+    assert f._data is None
+    assert f.image is None
+
+
+def _open_descriptors(filename):
+    # Return the file descriptors of this process that refer to a file
+    fd_dir = '/proc/self/fd'
+    descriptors = []
+    for fd in os.listdir(fd_dir):
+        try:
+            target = os.readlink(os.path.join(fd_dir, fd))
+        except OSError:
+            continue
+        if target == os.path.realpath(filename):
+            descriptors.append(fd)
+    return descriptors
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'),
+                    reason='requires /proc/self/fd')
+@pytest.mark.parametrize('kwargs', ({}, {'lazy': True}, {'raw': True}))
+def test_context_manager_descriptors(tmpdir, kwargs):
+
+    # Make sure that no file descriptors remain open once the figure is
+    # closed, including for memory-mapped data
+
+    filename = tmpdir.join('data.fits').strpath
+    fits.writeto(filename, np.arange(256, dtype=np.int16).reshape((16, 16)))
+
+    with FITSFigure(filename, **kwargs) as f:
+        f.show_grayscale()
+        f.show_contour(filename, levels=3)
+        f.show_vectors(filename, filename, step=4)
+
+    assert _open_descriptors(filename) == []
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'),
+                    reason='requires /proc/self/fd')
+def test_descriptors_errors(tmpdir):
+
+    # Make sure that files are closed when reading the data fails
+
+    filename = tmpdir.join('data.fits').strpath
+    fits.writeto(filename, np.arange(256.).reshape((16, 16)))
+
+    with pytest.raises(ValueError):
+        FITSFigure(filename, dimensions=[0, 5])
+    assert _open_descriptors(filename) == []
+
+    f = FITSFigure(np.zeros((16, 16)))
+    with pytest.raises(ValueError):
+        f.show_contour(filename, dimensions=[0, 5])
+    assert _open_descriptors(filename) == []
+    with pytest.raises(ValueError):
+        f.show_vectors(filename, filename, dimensions=[0, 5])
+    assert _open_descriptors(filename) == []
+    f.close()
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'),
+                    reason='requires /proc/self/fd')
+def test_descriptors_rgb(tmpdir):
+    pytest.importorskip('PIL')
+    filename = tmpdir.join('image.png').strpath
+    plt.imsave(filename, np.random.random((16, 16)))
+    f = FITSFigure(np.zeros((16, 16)))
+    f.show_rgb(filename)
+    assert _open_descriptors(filename) == []
+    f.close()
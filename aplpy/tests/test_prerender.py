@@ -0,0 +1,70 @@
+import pytest
+import numpy as np
+
+from .. import FITSFigure
+from ..prerender import PrerenderedImage
+
+np.random.seed(12345)
+ARRAY = np.random.random((100, 120))
+ARRAY[10:20, 10:20] = np.nan
+
+
+def render(f):
+    f._figure.canvas.draw()
+    return np.asarray(f._figure.canvas.buffer_rgba()).copy()
+
+
+@pytest.mark.parametrize('stretch', ('linear', 'log'))
+def test_prerender_identical(stretch):
+    f1 = FITSFigure(ARRAY, figsize=(3, 3))
+    f1.show_colorscale(stretch=stretch)
+    f2 = FITSFigure(ARRAY, figsize=(3, 3))
+    f2.show_colorscale(stretch=stretch, prerender=True)
+    assert isinstance(f2.image, PrerenderedImage)
+    np.testing.assert_array_equal(render(f1), render(f2))
+    f1.close()
+    f2.close()
+
+
+def test_prerender_cache():
+
+    f = FITSFigure(ARRAY, figsize=(3, 3))
+    f.show_colorscale(prerender=True)
+
+    render(f)
+    rgba = f.image._rgba
+    assert rgba.dtype == np.uint8 and rgba.shape == ARRAY.shape + (4,)
+
+    # Drawing again or changing the view should not re-compute the colors
+    f.recenter(50, 50, radius=10)
+    render(f)
+    assert f.image._rgba is rgba
+
+    # But changing the colorscale should
+    f.set_nan_color('red')
+    assert f.image._rgba is None
+    render(f)
+    assert not np.all(f.image._rgba == rgba)
+
+    rgba = f.image._rgba
+    f.set_theme('publication')
+    assert f.image._rgba is None
+
+    render(f)
+    f.show_colorscale(vmin=0.2, vmax=0.3, prerender=True)
+    assert f.image._rgba is None
+
+    # Switching back to a normal image
+    f.show_colorscale()
+    assert not isinstance(f.image, PrerenderedImage)
+    render(f)
+
+    f.close()
+
+
+def test_prerender_pyramid():
+    f = FITSFigure(ARRAY)
+    with pytest.raises(ValueError) as exc:
+        f.show_colorscale(prerender=True, pyramid=True)
+    assert exc.value.args[0] == "prerender= and pyramid= cannot be used together"
+    f.close()
@@ -0,0 +1,80 @@
+import numpy as np
+
+from .. import core
+from .. import FITSFigure
+from ..pyramid import ImagePyramid
+
+np.random.seed(12345)
+ARRAY = np.random.random((1000, 1201))
+
+
+def test_pyramid_levels():
+    pyramid = ImagePyramid(ARRAY, min_size=100)
+    assert pyramid.n_levels == 5
+    data, (scale_x, scale_y) = pyramid.get_level(1)
+    assert data.shape == (500, 601)
+    assert scale_x == 1202 / 1201 and scale_y == 1
+    assert pyramid.select_level(1.5) == 0
+    assert pyramid.select_level(5) == 2
+    assert pyramid.select_level(1000) == 4
+
+
+def test_pyramid_file(tmpdir):
+    filename = tmpdir.join('pyramid.fits').strpath
+    pyramid1 = ImagePyramid.from_file(filename, ARRAY, min_size=100)
+    pyramid2 = ImagePyramid.from_file(filename, ARRAY)
+    assert pyramid2.n_levels == pyramid1.n_levels
+    for level in range(pyramid1.n_levels):
+        np.testing.assert_array_equal(pyramid1.get_level(level)[0],
+                                      pyramid2.get_level(level)[0])
+    # Changing the data should cause the pyramid to be re-computed
+    pyramid3 = ImagePyramid.from_file(filename, ARRAY[:500, :500])
+    assert pyramid3.shape == (500, 500)
+
+
+def test_pyramid_file_modified(tmpdir):
+    # Any change to the data should cause the pyramid to be computed again
+    filename = tmpdir.join('pyramid.fits').strpath
+    ImagePyramid.from_file(filename, ARRAY, min_size=100)
+    modified = ARRAY.copy()
+    modified[1, 1] = np.nan
+    assert ImagePyramid.read(filename, ARRAY) is not None
+    assert ImagePyramid.read(filename, modified) is None
+
+
+def test_pyramid_figure():
+    f = FITSFigure(ARRAY, figsize=(2, 2))
+    f.show_colorscale(pyramid=True)
+    f._figure.canvas.draw()
+    assert f.image.get_array().shape[0] < ARRAY.shape[0]
+    f.recenter(600, 500, width=20, height=20)
+    f._figure.canvas.draw()
+    assert f.image.get_array().shape == ARRAY.shape
+    f.show_colorscale(pyramid=False)
+    f._figure.canvas.draw()
+    f.close()
+
+
+def test_pyramid_figure_cached(monkeypatch):
+
+    # Changing the style of the image should not compute the pyramid again
+
+    calls = []
+
+    class ImagePyramidCounted(ImagePyramid):
+        def __init__(self, data, **kwargs):
+            calls.append(data.shape)
+            super().__init__(data, **kwargs)
+
+    monkeypatch.setattr(core, 'ImagePyramid', ImagePyramidCounted)
+
+    f = FITSFigure(ARRAY, figsize=(2, 2))
+    f.show_colorscale(pyramid=True)
+    f.show_colorscale(pyramid=True, vmin=0.2, vmax=0.8, stretch='sqrt')
+    f.show_grayscale(pyramid=True)
+    assert len(calls) == 1
+    f.show_colorscale(pyramid=True, smooth=3)
+    assert len(calls) == 2
+    f.show_colorscale(pyramid=True, smooth=3, stretch='log')
+    assert len(calls) == 2
+    f.close()
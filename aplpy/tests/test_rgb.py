@@ -118,3 +118,31 @@ class TestRGB(BaseImageTests):
         f.add_grid()
 
         return f
+
+
+@pytest.mark.parametrize('interval', ('zscale', 'sigclip'))
+def test_rgb_interval(tmpdir, interval):
+
+    rgb_file = tmpdir.join('rgb.png').strpath
+
+    filenames = []
+    for color in 'rgb':
+        filename = tmpdir.join(color + '.fits').strpath
+        fits.writeto(filename, np.random.random((12, 12)))
+        filenames.append(filename)
+
+    make_rgb_image(filenames, rgb_file, embed_avm_tags=False,
+                   interval_r=interval, interval_g=interval,
+                   interval_b=interval)
+
+
+def test_rgb_interval_invalid(tmpdir):
+
+    filename = tmpdir.join('r.fits').strpath
+    fits.writeto(filename, np.random.random((12, 12)))
+
+    with pytest.raises(ValueError) as exc:
+        make_rgb_image([filename] * 3, tmpdir.join('rgb.png').strpath,
+                       embed_avm_tags=False, interval_r='minmax')
+    assert exc.value.args[0] == ("interval= should be one of 'percentile', "
+                                 "'zscale', 'sigclip'")
@@ -1,5 +1,8 @@
+import pytest
 import numpy as np
 
+from astropy.io import fits
+
 from ..core import FITSFigure
 
 from .test_images import BaseImageTests
@@ -30,3 +33,60 @@ class TestVectors(BaseImageTests):
         f.show_grayscale()
         f.show_vectors(PDATA, ADATA, step=2, scale=0.8, color='orange')
         return f
+
+
+def _reference_vectors(f, pdata, adata, step=1, scale=1, cutoff=0):
+    # Vectors computed one at a time
+    angle = np.radians(adata)
+    segments = []
+    for y in range(0, pdata.shape[0], step):
+        for x in range(0, pdata.shape[1], step):
+            if pdata[y, x] > cutoff and np.isfinite(angle[y, x]):
+                r = pdata[y, x] * 0.5 * scale
+                a = angle[y, x]
+                xw, yw = f.pixel2world([x + r * np.sin(a), x - r * np.sin(a)],
+                                       [y - r * np.cos(a), y + r * np.cos(a)])
+                segments.append(np.column_stack(f.world2pixel(xw, yw)))
+    return segments
+
+
+@pytest.mark.parametrize(('step', 'cutoff'), [(1, 0), (2, 0), (3, 1.)])
+def test_vectors_segments(step, cutoff):
+    pdata = PDATA.copy()
+    pdata[2, 4] = np.nan
+    adata = ADATA.copy()
+    adata[6, 6] = np.nan
+    f = FITSFigure(IMAGE, figsize=(4, 4))
+    f.show_vectors(pdata, adata, step=step, scale=0.8, cutoff=cutoff,
+                   layer='vectors')
+    expected = _reference_vectors(f, pdata, adata, step=step, scale=0.8,
+                                  cutoff=cutoff)
+    segments = f.get_layer('vectors').get_segments()
+    assert len(segments) == len(expected)
+    for segment, reference in zip(segments, expected):
+        np.testing.assert_allclose(segment, reference)
+    f.close()
+
+
+def test_vectors_cube():
+    # Vectors from two-dimensional data shown on a slice of a cube
+    header = fits.Header()
+    header['CTYPE1'], header['CRVAL1'], header['CDELT1'], header['CRPIX1'] = 'RA---TAN', 10., -0.01, 5.
+    header['CTYPE2'], header['CRVAL2'], header['CDELT2'], header['CRPIX2'] = 'DEC--TAN', 20., 0.01, 5.
+    header['CTYPE3'], header['CRVAL3'], header['CDELT3'], header['CRPIX3'] = 'FREQ', 1e9, 1e6, 1.
+    cube = fits.PrimaryHDU(np.random.random((3, 10, 10)), header)
+    header_2d = header.copy()
+    for keyword in ('CTYPE3', 'CRVAL3', 'CDELT3', 'CRPIX3'):
+        del header_2d[keyword]
+    pdata = fits.PrimaryHDU(PDATA, header_2d)
+    adata = fits.PrimaryHDU(ADATA, header_2d)
+    f = FITSFigure(cube, slices=[1], figsize=(4, 4))
+    f.show_vectors(pdata, adata, layer='vectors')
+    f_2d = FITSFigure(pdata, figsize=(4, 4))
+    f_2d.show_vectors(pdata, adata, layer='vectors')
+    segments = f.get_layer('vectors').get_segments()
+    segments_2d = f_2d.get_layer('vectors').get_segments()
+    assert len(segments) == 100
+    np.testing.assert_allclose(segments, segments_2d, atol=1e-8)
+    f.close()
+    f_2d.close()
@@ -0,0 +1,84 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from astropy.utils.shapes import simplify_basic_index
+
+__all__ = ['TiledSection']
+
+# Number of chunks to split each request into per worker, to balance the load
+CHUNKS_PER_WORKER = 4
+
+
+class TiledSection(object):
+    """
+    Access sections of a tile-compressed image, decompressing only the tiles
+    that intersect the requested region, in parallel.
+
+    Slicing this object behaves like slicing ``hdu.section``, but the
+    requested region is split into groups of tiles along the slowest varying
+    sliced dimension, and the groups are decompressed on a thread pool (the
+    decompression itself releases the GIL).
+
+    Parameters
+    ----------
+    hdu : `~astropy.io.fits.CompImageHDU`
+        The compressed image HDU.
+    max_workers : int, optional
+        The maximum number of threads to use. Defaults to the number of CPUs.
+    """
+
+    def __init__(self, hdu, max_workers=None):
+        self._section = hdu.section
+        self._tile_shape = hdu.tile_shape
+        self.shape = tuple(hdu.shape)
+        self.dtype = self._section.dtype
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        # Reading the compressed data from several threads is only safe if
+        # the file is memory-mapped
+        fileinfo = hdu.fileinfo()
+        if fileinfo is None or not getattr(fileinfo['file'], 'memmap', False):
+            max_workers = 1
+        self.max_workers = max_workers
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __getitem__(self, index):
+
+        index = simplify_basic_index(index, shape=self.shape)
+
+        # Find the first dimension that is sliced rather than indexed, since
+        # the result can then be assembled by concatenating along the first
+        # dimension.
+        for axis, item in enumerate(index):
+            if isinstance(item, slice):
+                break
+        else:
+            return self._section[index]
+
+        if self.max_workers == 1 or item.step != 1:
+            return self._section[index]
+
+        # Split the range into chunks aligned with the tile boundaries
+        tile_size = self._tile_shape[axis]
+        first_tile = item.start // tile_size
+        last_tile = (item.stop - 1) // tile_size
+        n_tiles = last_tile - first_tile + 1
+        n_chunks = min(n_tiles, self.max_workers * CHUNKS_PER_WORKER)
+
+        if n_chunks < 2:
+            return self._section[index]
+
+        edges = first_tile + np.linspace(0, n_tiles, n_chunks + 1).astype(int)
+        edges = np.clip(edges * tile_size, item.start, item.stop)
+
+        keys = [index[:axis] + (slice(start, stop, 1),) + index[axis + 1:]
+                for start, stop in zip(edges[:-1], edges[1:]) if stop > start]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            chunks = list(executor.map(self._section.__getitem__, keys))
+
+        return np.concatenate(chunks, axis=0)